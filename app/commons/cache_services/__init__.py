@@ -0,0 +1,96 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from app.config import ConfigClass
+
+_MISSING = object()
+
+
+class TTLCache():
+    '''
+    In process LRU cache, entries expire ttl seconds after they were set
+    '''
+    def __init__(self, name: str, maxsize: int, ttl: float, timer: Callable[[], float] = time.monotonic):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value, expires_at = self._data.get(key, (_MISSING, 0))
+            if value is _MISSING or expires_at <= self.timer():
+                self._data.pop(key, None)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, self.timer() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable = None):
+        # Drop a single key or the whole cache when no key is given
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+node_cache = TTLCache("node", ConfigClass.CACHE_MAXSIZE, ConfigClass.CACHE_NODE_TTL)
+project_cache = TTLCache("project", ConfigClass.CACHE_MAXSIZE, ConfigClass.CACHE_PROJECT_TTL)
+routing_cache = TTLCache("routing", ConfigClass.CACHE_MAXSIZE, ConfigClass.CACHE_ROUTING_TTL)
+caches = [node_cache, project_cache, routing_cache]
+
+
+def cache_stats() -> dict:
+    return {cache.name: cache.stats() for cache in caches}
+
+
+def invalidate_caches():
+    for cache in caches:
+        cache.invalidate()
@@ -0,0 +1,87 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+import time
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config import ConfigClass
+
+IDEMPOTENT_METHODS = ["GET", "HEAD", "OPTIONS"]
+RETRY_STATUS_CODES = [502, 503, 504]
+
+
+class HTTPClient():
+    '''
+    Keep-alive client shared by every outbound call of the process,
+    requests keeps one connection pool per downstream host
+    '''
+    def __init__(self, connect_timeout: float, read_timeout: float, pool_connections: int, pool_maxsize: int,
+                 max_retries: int, retry_backoff: float):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method: str, url: str, retry: bool = None, **kwargs) -> requests.Response:
+        # Only idempotent calls are retried, POST queries that only read data can opt in with retry=True
+        if retry is None:
+            retry = method.upper() in IDEMPOTENT_METHODS
+        retries = self.max_retries if retry else 0
+        kwargs.setdefault("timeout", self.timeout)
+        for attempt in range(retries + 1):
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or attempt == retries:
+                    return response
+            time.sleep(self.retry_backoff * 2 ** attempt)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+
+@lru_cache(1)
+def get_http_client() -> HTTPClient:
+    return HTTPClient(
+        connect_timeout=ConfigClass.HTTP_CONNECT_TIMEOUT,
+        read_timeout=ConfigClass.HTTP_READ_TIMEOUT,
+        pool_connections=ConfigClass.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=ConfigClass.HTTP_POOL_MAXSIZE,
+        max_retries=ConfigClass.HTTP_MAX_RETRIES,
+        retry_backoff=ConfigClass.HTTP_RETRY_BACKOFF,
+    )
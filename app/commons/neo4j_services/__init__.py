@@ -18,44 +18,87 @@
 # permissions and limitations under the Licence.
 # 
 
-import requests
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from app.commons.cache_services import node_cache, project_cache
+from app.commons.http_services import get_http_client
 from app.config import ConfigClass
 from app.models.base import EAPIResponseCode
 from app.resources.error_handler import APIException
-from typing import List
+from app.resources.helpers import chunks
+from typing import Iterator, List
 
 
 def query_node(label: str, query_data: dict) -> dict:
-    response = requests.post(ConfigClass.NEO4J_SERVICE + f"nodes/{label}/query", json=query_data)
+    # Projects barely change so Container lookups are served from the project cache
+    cache_key = (label, json.dumps(query_data, sort_keys=True))
+    if label == "Container":
+        node = project_cache.get(cache_key)
+        if node is not None:
+            return dict(node)
+
+    response = get_http_client().post(ConfigClass.NEO4J_SERVICE + f"nodes/{label}/query", json=query_data, retry=True)
     if response.status_code != 200:
         error_msg = f"Error calling Neo4j service: {response.json()}"
         raise APIException(error_msg=error_msg, status_code=EAPIResponseCode.internal_error.value)
     if not response.json():
         error_msg = f"{label} not found: {query_data}"
         raise APIException(error_msg=error_msg, status_code=EAPIResponseCode.not_found.value)
-    return response.json()[0]
+    node = response.json()[0]
+    if label == "Container":
+        project_cache.set(cache_key, dict(node))
+    return node
 
 def get_node_by_geid(geid: str) -> dict:
-    response = requests.get(ConfigClass.NEO4J_SERVICE + f"nodes/geid/{geid}")
+    node = node_cache.get(geid)
+    if node is not None:
+        return dict(node)
+
+    response = get_http_client().get(ConfigClass.NEO4J_SERVICE + f"nodes/geid/{geid}")
     if response.status_code != 200:
         error_msg = f"Error calling Neo4j service: {response.json()}"
         raise APIException(error_msg=error_msg, status_code=EAPIResponseCode.internal_error.value)
     if not response.json():
         error_msg = f"Folder not found"
         raise APIException(error_msg=error_msg, status_code=EAPIResponseCode.not_found.value)
-    return response.json()[0]
+    node = response.json()[0]
+    node_cache.set(geid, dict(node))
+    return node
 
-def bulk_get_by_geids(geids: List[str]) -> List[dict]:
+def invalidate_node(geid: str = None):
+    # Drop a cached node, or every cached node when no geid is given
+    node_cache.invalidate(geid)
+
+def get_nodes_by_geids(geids: List[str]) -> List[dict]:
     query_data = {"geids": geids}
-    response = requests.post(ConfigClass.NEO4J_SERVICE + "nodes/query/geids", json=query_data)
+    response = get_http_client().post(ConfigClass.NEO4J_SERVICE + "nodes/query/geids", json=query_data, retry=True)
     if response.status_code != 200:
         error_msg = f"Error calling Neo4j service: {response.json()}"
         raise APIException(error_msg=error_msg, status_code=EAPIResponseCode.internal_error.value)
     return response.json()["result"]
 
 
+def bulk_get_by_geids(geids: List[str]) -> Iterator[dict]:
+    # Geids are fetched in chunks of NEO4J_BULK_CHUNK_SIZE, at most NEO4J_MAX_CONCURRENCY chunks in flight,
+    # nodes are yielded in chunk order as soon as their chunk arrives
+    with ThreadPoolExecutor(max_workers=ConfigClass.NEO4J_MAX_CONCURRENCY) as executor:
+        in_flight = deque()
+        for geids_chunk in chunks(geids, ConfigClass.NEO4J_BULK_CHUNK_SIZE):
+            in_flight.append(executor.submit(get_nodes_by_geids, geids_chunk))
+            if len(in_flight) >= ConfigClass.NEO4J_MAX_CONCURRENCY:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+
+def get_parent_display_path(node: dict) -> str:
+    return "/".join(node["display_path"].split("/")[:-1])
+
+
 def get_parent(node: dict) -> dict:
-    display_path = "/".join(node["display_path"].split("/")[:-1])
+    display_path = get_parent_display_path(node)
     query_data = {
         "query": {
             "labels": ["Folder", "Greenroom"],
@@ -63,7 +106,7 @@ def get_parent(node: dict) -> dict:
             "project_code": node["project_code"]
         }
     }
-    response = requests.post(ConfigClass.NEO4J_SERVICE_V2 + "nodes/query", json=query_data)
+    response = get_http_client().post(ConfigClass.NEO4J_SERVICE_V2 + "nodes/query", json=query_data, retry=True)
     if response.status_code != 200:
         error_msg = f"Error calling Neo4j service: {response.json()}"
         logger.error(error_msg)
@@ -71,15 +114,16 @@ def get_parent(node: dict) -> dict:
     return response.json()["result"][0]
 
 
-def get_files_recursive(folder_geid: str, all_files: list = None) -> list:
-    if all_files is None:
-        all_files = []
+def get_children(folders: List[dict]) -> List[dict]:
+    # Get the direct children of a batch of folders in one relations query, folder nodes get
+    # parent_folder_geid set to the folder in the batch they belong to
+    folder_geids = [i["global_entity_id"] for i in folders]
     query = {
         "start_label": "Folder",
         "end_labels": ["File", "Folder"],
         "query": {
             "start_params": {
-                "global_entity_id": folder_geid,
+                "global_entity_id": folder_geids[0] if len(folder_geids) == 1 else folder_geids,
             },
             "end_params": {
                 "File": {
@@ -91,15 +135,35 @@ def get_files_recursive(folder_geid: str, all_files: list = None) -> list:
             },
         },
     }
-    resp = requests.post(ConfigClass.NEO4J_SERVICE_V2 + "relations/query", json=query)
-    for node in resp.json()["results"]:
+    response = get_http_client().post(ConfigClass.NEO4J_SERVICE_V2 + "relations/query", json=query, retry=True)
+    if response.status_code != 200:
+        error_msg = f"Error calling Neo4j service: {response.json()}"
+        raise APIException(error_msg=error_msg, status_code=EAPIResponseCode.internal_error.value)
+
+    folder_paths = {i.get("display_path"): i["global_entity_id"] for i in folders}
+    children = response.json()["results"]
+    for node in children:
         if "File" in node["labels"]:
-            all_files.append(node)
+            continue
+        if len(folder_geids) == 1:
+            node["parent_folder_geid"] = folder_geids[0]
         else:
-            node["parent_folder_geid"] = folder_geid
-            all_files.append(node)
-            get_files_recursive(node["global_entity_id"], all_files=all_files)
-    return all_files
-
+            parent_path = get_parent_display_path(node)
+            node["parent_folder_geid"] = folder_paths.get(parent_path) or node.get("parent_folder_geid")
+    return children
 
 
+def get_files_recursive(folder_geid: str, all_files: list = None) -> list:
+    # Breadth first, every level of the tree is fetched in batches of NEO4J_RELATION_BATCH_SIZE folders
+    if all_files is None:
+        all_files = []
+    level = [{"global_entity_id": folder_geid}]
+    while level:
+        next_level = []
+        for folders in chunks(level, ConfigClass.NEO4J_RELATION_BATCH_SIZE):
+            for node in get_children(folders):
+                all_files.append(node)
+                if "File" not in node["labels"]:
+                    next_level.append(node)
+        level = next_level
+    return all_files
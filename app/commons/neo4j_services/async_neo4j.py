@@ -0,0 +1,104 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+import asyncio
+import math
+from collections import deque
+from typing import AsyncIterator, List
+
+from app.commons import neo4j_services
+from app.config import ConfigClass
+from app.resources.helpers import chunks
+
+# asyncio versions of the neo4j service calls, the http calls run on the shared pooled client in worker
+# threads and the number of calls in flight is capped by a semaphore of NEO4J_MAX_CONCURRENCY
+
+
+def get_semaphore() -> asyncio.Semaphore:
+    return asyncio.Semaphore(ConfigClass.NEO4J_MAX_CONCURRENCY)
+
+
+async def run_limited(semaphore: asyncio.Semaphore, func, *args):
+    async with semaphore:
+        return await asyncio.to_thread(func, *args)
+
+
+async def get_node_by_geid(geid: str, semaphore: asyncio.Semaphore = None) -> dict:
+    return await run_limited(semaphore or get_semaphore(), neo4j_services.get_node_by_geid, geid)
+
+
+async def bulk_get_by_geids(geids: List[str], semaphore: asyncio.Semaphore = None) -> AsyncIterator[dict]:
+    # Chunks are fetched concurrently, nodes are yielded in chunk order as soon as their chunk arrives
+    if semaphore is None:
+        semaphore = get_semaphore()
+    in_flight = deque()
+    try:
+        for geids_chunk in chunks(geids, ConfigClass.NEO4J_BULK_CHUNK_SIZE):
+            in_flight.append(asyncio.ensure_future(
+                run_limited(semaphore, neo4j_services.get_nodes_by_geids, geids_chunk)
+            ))
+            if len(in_flight) >= ConfigClass.NEO4J_MAX_CONCURRENCY:
+                for node in await in_flight.popleft():
+                    yield node
+        while in_flight:
+            for node in await in_flight.popleft():
+                yield node
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+
+async def iter_children(folders: List[dict], semaphore: asyncio.Semaphore = None) -> AsyncIterator[List[dict]]:
+    '''
+    Breadth first expansion of folders, the children of every relations query are yielded as soon as it returns.
+    Every level is split over the available concurrency slots so sibling folders are expanded concurrently,
+    a level is yielded entirely before the next one is queried so parents always come before their children
+    '''
+    if semaphore is None:
+        semaphore = get_semaphore()
+    level = folders
+    while level:
+        batch_size = min(
+            ConfigClass.NEO4J_RELATION_BATCH_SIZE,
+            math.ceil(len(level) / ConfigClass.NEO4J_MAX_CONCURRENCY),
+        )
+        in_flight = [
+            asyncio.ensure_future(run_limited(semaphore, neo4j_services.get_children, batch))
+            for batch in chunks(level, batch_size)
+        ]
+        next_level = []
+        try:
+            for result in asyncio.as_completed(in_flight):
+                children = await result
+                next_level.extend(i for i in children if "File" not in i["labels"])
+                yield children
+        finally:
+            for task in in_flight:
+                task.cancel()
+        level = next_level
+
+
+async def get_files_recursive(folder_geid: str, all_files: list = None, semaphore: asyncio.Semaphore = None) -> list:
+    # Same traversal as neo4j_services.get_files_recursive with the sibling folders expanded concurrently
+    if all_files is None:
+        all_files = []
+    async for children in iter_children([{"global_entity_id": folder_geid}], semaphore):
+        all_files.extend(children)
+    return all_files
@@ -18,8 +18,8 @@
 # permissions and limitations under the Licence.
 # 
 
+from app.commons.http_services import get_http_client
 from app.config import ConfigClass
-import requests
 import json
 
 
@@ -37,7 +37,7 @@ class SrvEmail():
         if template:
             payload["template"] = template
             payload["template_kwargs"] = template_kwargs
-        res = requests.post(
+        res = get_http_client().post(
             url=url,
             json=payload
         )
@@ -18,8 +18,7 @@
 # permissions and limitations under the Licence.
 # 
 
-import requests
-
+from app.commons.http_services import get_http_client
 from app.commons.logger_services.logger_factory_service import SrvLoggerFactory
 from app.config import ConfigClass
 from app.models.base import EAPIResponseCode
@@ -50,7 +49,7 @@ def trigger_copy_pipeline(
         'project_geid': project_geid,
         'session_id': session_id,
     }
-    response = requests.post(ConfigClass.DATA_UTILITY_SERVICE + 'files/actions', json=copy_data, headers=auth)
+    response = get_http_client().post(ConfigClass.DATA_UTILITY_SERVICE + 'files/actions', json=copy_data, headers=auth)
     if response.status_code >= 300:
         error_msg = f'Failed to start copy pipeline: {response.content}'
         logger.error(error_msg)
@@ -19,100 +19,622 @@
 # 
 
 from fastapi_sqlalchemy import db
-from app.models.copy_request_sql import EntityModel, RequestModel
-from datetime import datetime
+from sqlalchemy import String, and_, any_, bindparam, false, func, insert, or_, update
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, aliased
+from app.commons.cache_services import routing_cache
+from app.config import ConfigClass
+from app.models.copy_request_sql import EntityModel, RequestModel, RequestSummaryModel
+from app.resources.helpers import chunks, parse_time
+from datetime import datetime, timedelta
+from typing import Iterable
+from uuid import uuid4
 
+# Query builders build on the request's fastapi_sqlalchemy session and the caller executes them, the functions
+# running statements take the session to run them on, the endpoints pass theirs with AsyncSession.run_sync
 
-def get_sql_files_recursive(request_id: str, folder_geid: str, file_geids: list[str] = None) -> list[EntityModel]:
-    if not file_geids:
-        file_geids = []
+SUMMARY_COUNTERS = [
+    "pending_count",
+    "archived_count",
+    "approved_count",
+    "denied_count",
+    "total_size",
+    "approved_size",
+    "folder_count",
+]
 
-    entities = db.session.query(EntityModel).filter_by(request_id=request_id, parent_geid=folder_geid)
-    for entity in entities:
-        if entity.entity_type == "file":
-            if entity.review_status == "pending":
-                file_geids.append(entity.entity_geid)
-        else:
-            file_geids = get_sql_files_recursive(request_id, entity.entity_geid, file_geids=file_geids)
-    return file_geids
+ROLLUP_COUNTERS = [
+    "file_count",
+    "total_size",
+    "pending_count",
+    "approved_count",
+    "denied_count",
+]
 
 
-def get_all_sub_files(request_id: str, entity_geids: list[str]) -> list[str]:
-    entities = db.session.query(EntityModel).filter_by(request_id=request_id).filter(
-        EntityModel.entity_geid.in_(entity_geids)
-    )
-    file_geids = []
-    for entity in entities:
-        if entity.entity_type == "file":
-            file_geids.append(entity.entity_geid)
-        else:
-            # Get all files in subfolder
-            file_geids = get_sql_files_recursive(request_id, entity.entity_geid, file_geids=file_geids)
-    return file_geids
+def get_requests_query(project_geid: str, status: str, submitted_by: str = None, model=RequestModel):
+    # model is RequestArchiveModel to read archived requests
+    requests = db.session.query(model).filter_by(status=status, project_geid=project_geid)
+    if submitted_by:
+        requests = requests.filter_by(submitted_by=submitted_by)
+    return requests
+
 
+def get_request_files_query(request_id: str, parent_geid: str = None, query: dict = None, partial: list = None,
+                            partial_match: str = "contains", model=EntityModel):
+    # Entities of a folder of the request, top level entities when parent_geid is empty.
+    # Keys of query listed in partial are matched with partial_match, the others exactly
+    files = db.session.query(model).filter_by(request_id=request_id, parent_geid=parent_geid or None)
+    return filter_entities(files, query, partial, partial_match, model)
 
-def get_sql_file_nodes_recursive(request_id: str, folder_geid: str, review_status: str, files: list=None) -> list[EntityModel]:
-    if not files:
-        files = []
 
-    entities = db.session.query(EntityModel).filter_by(request_id=request_id, parent_geid=folder_geid)
-    for entity in entities:
-        if entity.entity_type == "file":
-            if entity.review_status == review_status:
-                files.append(entity.entity_geid)
+def filter_entities(files, query: dict = None, partial: list = None, partial_match: str = "contains",
+                    model=EntityModel):
+    for key, value in (query or {}).items():
+        if key in (partial or []):
+            files = files.filter(get_partial_filter(getattr(model, key), value, partial_match))
         else:
-            files = get_sql_file_nodes_recursive(request_id, entity.entity_geid, review_status, files=files)
+            files = files.filter_by(**{key: value})
     return files
 
 
-def get_all_sub_folder_nodes(request_id: str, entity_geids: list[str], review_status: str) -> list[str]:
-    entities = db.session.query(EntityModel).filter_by(request_id=request_id).filter(
-        EntityModel.entity_geid.in_(entity_geids)
+def get_export_query(request_id: str, folder_path: str = None, query: dict = None, partial: list = None,
+                     partial_match: str = "contains", model=EntityModel):
+    # Every entity of the request, or of the subtree under the folder with folder_path, unordered
+    files = db.session.query(model).filter(model.request_id == request_id)
+    if folder_path:
+        files = files.filter(model.path.like(path_prefix_pattern(folder_path)), model.path != folder_path)
+    return filter_entities(files, query, partial, partial_match, model)
+
+
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def get_partial_filter(column, value: str, partial_match: str = "contains"):
+    # contains, icontains, prefix or iprefix, the trigram indexes on name, uploaded_by and dcm_id serve all of them
+    pattern = escape_like(str(value)) + "%"
+    if partial_match in ["contains", "icontains"]:
+        pattern = "%" + pattern
+    if partial_match.startswith("i"):
+        return column.ilike(pattern, escape="\\")
+    return column.like(pattern, escape="\\")
+
+
+def path_prefix_pattern(path: str) -> str:
+    # LIKE pattern matching every path under the given one, can use the varchar_pattern_ops index
+    return escape_like(path) + "%"
+
+
+def get_subtree_filter(session: Session, request_id: str, entity_geids: list[str]):
+    # Filter on the rows under the given folders, one prefix range scan per folder on the path index
+    folders = session.query(EntityModel.path).filter(
+        EntityModel.request_id == request_id,
+        EntityModel.entity_type == "folder",
+        EntityModel.entity_geid.in_(entity_geids),
     )
-    files = []
-    for entity in entities:
-        if entity.entity_type == "folder":
-            # Get all files in subfolder
-            files = get_sql_file_nodes_recursive(request_id, entity.entity_geid, review_status, files=files)
-    return files
+    folder_paths = {i.path for i in folders if i.path}
+    return or_(false(), *[EntityModel.path.like(path_prefix_pattern(i)) for i in folder_paths])
+
+
+def get_sub_files_query(session: Session, request_id: str, entity_geids: list[str]):
+    # Files given directly plus the pending files in subfolders
+    return session.query(EntityModel.entity_geid).filter(
+        EntityModel.request_id == request_id,
+        EntityModel.entity_type == "file",
+        or_(
+            EntityModel.entity_geid.in_(entity_geids),
+            and_(EntityModel.review_status == "pending", get_subtree_filter(session, request_id, entity_geids)),
+        ),
+    )
+
+
+def get_all_sub_files(session: Session, request_id: str, entity_geids: list[str]) -> list[str]:
+    return [i.entity_geid for i in get_sub_files_query(session, request_id, entity_geids)]
+
+
+def get_sub_folder_files_query(session: Session, request_id: str, entity_geids: list[str], review_status: str):
+    # Files with review_status in the subfolders of the given entities
+    return session.query(EntityModel.entity_geid).filter(
+        EntityModel.request_id == request_id,
+        EntityModel.entity_type == "file",
+        EntityModel.review_status == review_status,
+        get_subtree_filter(session, request_id, entity_geids),
+    )
+
+
+def get_all_sub_folder_nodes(session: Session, request_id: str, entity_geids: list[str],
+                             review_status: str) -> list[str]:
+    return [i.entity_geid for i in get_sub_folder_files_query(session, request_id, entity_geids, review_status)]
+
+
+def get_ancestors_query(request_id: str, entity_geid: str, model=EntityModel):
+    # The entity and all its parents up to the top level, read from the entity path in one query
+    entity = aliased(model)
+    entity_path = db.session.query(entity.path).filter(
+        entity.request_id == request_id, entity.entity_geid == entity_geid
+    ).limit(1).scalar_subquery()
+    ancestors = db.session.query(model).filter(
+        model.request_id == request_id,
+        model.entity_geid == any_(func.string_to_array(entity_path, "/")),
+    ).order_by(func.length(model.path).desc())
+    return ancestors
+
+
+def get_routing_data(entity) -> dict:
+    # Breadcrumb entry of a folder, the rollups change with every review so only the folder listing carries them
+    return {key: value for key, value in entity.to_dict().items() if key not in ROLLUP_COUNTERS}
+
+
+def get_cached_routing(request_id: str, folder_geid: str) -> list[dict]:
+    routing = routing_cache.get((str(request_id), folder_geid))
+    return None if routing is None else [dict(i) for i in routing]
+
+
+def set_cached_routing(request_id: str, folder_geid: str, routing: list[dict]):
+    # Not cached when empty, the folder may still be ingested
+    if routing:
+        routing_cache.set((str(request_id), folder_geid), [dict(i) for i in routing])
+
+
+def get_count_column(review_status: str, archived: bool) -> str:
+    # Summary counter of a file in the given state
+    if review_status == "pending":
+        return "archived_count" if archived else "pending_count"
+    return f"{review_status}_count"
+
+
+def increment_request_summary(session: Session, request_id: str, deltas: dict):
+    # Add deltas to the summary counters of the request in the current transaction,
+    # the summary row is created on first use
+    deltas = {key: value for key, value in deltas.items() if value}
+    summary_table = RequestSummaryModel.__table__
+    summary = pg_insert(summary_table).values(request_id=request_id, **deltas)
+    if deltas:
+        summary = summary.on_conflict_do_update(
+            index_elements=[summary_table.c.request_id],
+            set_={key: summary_table.c[key] + summary.excluded[key] for key in deltas},
+        )
+    else:
+        summary = summary.on_conflict_do_nothing(index_elements=[summary_table.c.request_id])
+    session.execute(summary)
+
+
+def refresh_request_summary(session: Session, request_id: str):
+    # Recompute the summary counters of the request from its entities
+    states = session.query(
+        EntityModel.entity_type,
+        EntityModel.review_status,
+        EntityModel.archived,
+        func.count(),
+        func.coalesce(func.sum(EntityModel.file_size), 0),
+    ).filter_by(request_id=request_id).group_by(
+        EntityModel.entity_type, EntityModel.review_status, EntityModel.archived
+    )
+    counters = {key: 0 for key in SUMMARY_COUNTERS}
+    for entity_type, review_status, archived, count, size in states:
+        if entity_type == "folder":
+            counters["folder_count"] += count
+            continue
+        counters[get_count_column(review_status, archived)] += count
+        counters["total_size"] += size
+        if review_status == "approved":
+            counters["approved_size"] += size
+    summary_table = RequestSummaryModel.__table__
+    summary = pg_insert(summary_table).values(request_id=request_id, **counters)
+    summary = summary.on_conflict_do_update(
+        index_elements=[summary_table.c.request_id],
+        set_={key: summary.excluded[key] for key in counters},
+    )
+    session.execute(summary)
+
+
+def lock_request_summary(session: Session, request_id: str) -> RequestSummaryModel:
+    # Row lock on the summary, taken before reading entity states that are turned into counter deltas
+    summary = session.query(RequestSummaryModel).filter_by(request_id=request_id).with_for_update()
+    if not summary.populate_existing().first():
+        refresh_request_summary(session, request_id)
+    return summary.populate_existing().first()
+
+
+def get_request_summary(session: Session, request_id: str) -> RequestSummaryModel:
+    summary = session.query(RequestSummaryModel).filter_by(request_id=request_id).populate_existing().first()
+    if not summary:
+        refresh_request_summary(session, request_id)
+        session.commit()
+        summary = session.query(RequestSummaryModel).filter_by(request_id=request_id).first()
+    return summary
+
+
+def get_review_deltas(states: Iterable[tuple], review_status: str) -> dict:
+    # Counter deltas of moving files from their current (review_status, archived, count, size) states
+    deltas = {key: 0 for key in SUMMARY_COUNTERS}
+    for old_status, archived, count, size in states:
+        if old_status == review_status:
+            continue
+        deltas[get_count_column(old_status, archived)] -= count
+        deltas[get_count_column(review_status, archived)] += count
+        if old_status == "approved":
+            deltas["approved_size"] -= size
+        if review_status == "approved":
+            deltas["approved_size"] += size
+    return deltas
+
+
+def get_ancestor_geids(path: str) -> list[str]:
+    # Geids of the folders above an entity, read from its path
+    return path.strip("/").split("/")[:-1] if path else []
+
+
+def add_rollup_deltas(rollups: dict, path: str, deltas: dict):
+    # Add deltas to the rollups, keyed by folder geid, of every folder above the entity with path
+    for geid in get_ancestor_geids(path):
+        folder = rollups.setdefault(geid, {key: 0 for key in ROLLUP_COUNTERS})
+        for key, value in deltas.items():
+            folder[key] += value
+
+
+def get_rollup_deltas(deltas: dict) -> dict:
+    # Summary counter deltas that are also folder rollups, archived files are only counted in the summary
+    return {key: value for key, value in deltas.items() if key in ROLLUP_COUNTERS}
+
+
+def get_review_rollups(files: Iterable[tuple], review_status: str) -> dict:
+    # Rollup deltas of moving files from their current (path, review_status, archived) to review_status
+    rollups = {}
+    for path, old_status, archived in files:
+        if old_status == review_status:
+            continue
+        deltas = {get_count_column(old_status, archived): -1, get_count_column(review_status, archived): 1}
+        add_rollup_deltas(rollups, path, get_rollup_deltas(deltas))
+    return rollups
+
 
+def increment_folder_rollups(session: Session, request_id: str, rollups: dict):
+    # Add the rollup deltas to the folder rows in the current transaction, one executemany UPDATE
+    if not rollups:
+        return
+    entity_table = EntityModel.__table__
+    folders = update(entity_table).where(
+        entity_table.c.request_id == request_id,
+        entity_table.c.entity_type == "folder",
+        entity_table.c.entity_geid == bindparam("folder_geid"),
+    ).values({key: entity_table.c[key] + bindparam(f"{key}_delta") for key in ROLLUP_COUNTERS})
+    params = [
+        {"folder_geid": geid, **{f"{key}_delta": value for key, value in deltas.items()}}
+        for geid, deltas in sorted(rollups.items())
+    ]
+    session.execute(folders, params)
 
-def update_files_sql(request_id: str, review_status: str, username: str, file_geids: list[str]) -> int:
+
+def get_geids_filter(file_geids: list[str]):
+    # A single array parameter instead of one bind parameter per geid
+    return EntityModel.entity_geid == any_(bindparam("file_geids", file_geids, type_=ARRAY(String)))
+
+
+def update_files_sql(session: Session, request_id: str, review_status: str, username: str,
+                     file_geids: list[str], chunk_size: int = None) -> int:
+    # Every chunk is its own transaction so row locks are only held for one chunk at a time
+    chunk_size = chunk_size or ConfigClass.ENTITY_UPDATE_CHUNK_SIZE
     review_data = {
         "review_status": review_status,
         "reviewed_by": username,
-        "reviewed_at": datetime.utcnow(),
+        # reviewed_at is a varchar column, asyncpg binds strings only
+        "reviewed_at": str(datetime.utcnow()),
     }
-    files = db.session.query(EntityModel).filter_by(request_id=request_id).filter(
-        EntityModel.entity_geid.in_(file_geids)
-    )
-    files.update(review_data)
-    db.session.commit()
-    return files.count()
+    updated = 0
+    for chunk in chunks(file_geids, chunk_size):
+        lock_request_summary(session, request_id)
+        files = session.query(EntityModel).filter_by(request_id=request_id).filter(get_geids_filter(chunk))
+        states = files.filter(EntityModel.entity_type == "file").with_entities(
+            EntityModel.review_status,
+            EntityModel.archived,
+            func.count(),
+            func.coalesce(func.sum(EntityModel.file_size), 0),
+        ).group_by(EntityModel.review_status, EntityModel.archived)
+        deltas = get_review_deltas(states, review_status)
+        rollups = get_review_rollups(files.filter(EntityModel.entity_type == "file").with_entities(
+            EntityModel.path, EntityModel.review_status, EntityModel.archived
+        ), review_status)
+        updated += files.update(review_data, synchronize_session=False)
+        increment_request_summary(session, request_id, deltas)
+        increment_folder_rollups(session, request_id, rollups)
+        session.commit()
+    return updated
 
 
-def create_entity_from_node(request_id: str, entity: dict) -> EntityModel:
-    # Create entity in psql given neo4j node
+def get_entity_path(session: Session, request_id: str, entity: dict, paths: dict) -> str:
+    # paths caches the path of the folders already created, parents are looked up in psql otherwise
+    parent_geid = entity["parent_folder_geid"]
+    if not parent_geid:
+        parent_path = "/"
+    elif parent_geid in paths:
+        parent_path = paths[parent_geid]
+    else:
+        parent = session.query(EntityModel.path).filter_by(request_id=request_id, entity_geid=parent_geid).first()
+        parent_path = parent.path if parent and parent.path else "/"
+    return parent_path + entity["global_entity_id"] + "/"
+
+
+def get_entity_data(session: Session, request_id: str, entity: dict, paths: dict) -> dict:
+    # Row data of an approval_entity given neo4j node, every row has the same keys so rows can be bulk inserted
     if "File" in entity["labels"]:
         entity_type = "file"
     else:
         entity_type = "folder"
 
     entity_data = {
+        "id": uuid4(),
         "request_id": request_id,
         "entity_geid": entity["global_entity_id"],
         "entity_type": entity_type,
         "parent_geid": entity["parent_folder_geid"],
         "name": entity["name"],
         "uploaded_by": entity["uploader"],
-        "uploaded_at": entity["time_created"],
+        "uploaded_at": parse_time(entity["time_created"]),
         "dcm_id": entity.get("dcm_id"),
+        "archived": entity.get("archived", False),
+        "archived_synced_at": datetime.utcnow(),
+        "path": get_entity_path(session, request_id, entity, paths),
+        "review_status": None,
+        "file_size": None,
+        "copy_status": None,
     }
+    for key in ROLLUP_COUNTERS:
+        entity_data[key] = 0 if entity_type == "folder" else None
+    if entity_type == "folder":
+        paths[entity_data["entity_geid"]] = entity_data["path"]
     if entity_type == "file":
         entity_data["review_status"] = "pending"
         entity_data["file_size"] = entity["file_size"]
         entity_data["copy_status"] = "pending"
+    return entity_data
+
+
+def get_ingestion_deltas(rows: Iterable[dict]) -> dict:
+    deltas = {key: 0 for key in SUMMARY_COUNTERS}
+    for row in rows:
+        if row["entity_type"] == "folder":
+            deltas["folder_count"] += 1
+        else:
+            deltas[get_count_column(row["review_status"], row["archived"])] += 1
+            deltas["total_size"] += row["file_size"] or 0
+    return deltas
+
+
+def add_ingestion_rollups(rollups: dict, rows: Iterable[dict]) -> dict:
+    for row in rows:
+        if row["entity_type"] == "file":
+            add_rollup_deltas(rollups, row["path"], get_rollup_deltas({
+                "file_count": 1,
+                "total_size": row["file_size"] or 0,
+                get_count_column(row["review_status"], row["archived"]): 1,
+            }))
+    return rollups
+
+
+def create_entity_from_node(session: Session, request_id: str, entity: dict, paths: dict = None) -> EntityModel:
+    # Create entity in psql given neo4j node
+    if paths is None:
+        paths = {}
+    entity_data = get_entity_data(session, request_id, entity, paths)
     entity_obj = EntityModel(**entity_data)
-    db.session.add(entity_obj)
-    db.session.commit()
+    session.add(entity_obj)
+    increment_request_summary(session, request_id, get_ingestion_deltas([entity_data]))
+    increment_folder_rollups(session, request_id, add_ingestion_rollups({}, [entity_data]))
+    session.commit()
     return entity_obj
+
+
+def bulk_create_entities(session: Session, request_id: str, entities: Iterable[dict], batch_size: int = None,
+                         commit: bool = False, paths: dict = None) -> int:
+    # Insert the entities of a request given neo4j nodes, parents have to come before their children.
+    # Rows are sent in multi-row INSERTs of batch_size rows and the caller commits the transaction,
+    # with commit every batch is its own transaction so the ingestion progress shows in the summary,
+    # batches stop as soon as the request leaves the ingesting state. Returns the number of rows inserted.
+    # paths carries the folder paths over the calls of one ingestion
+    if batch_size is None:
+        batch_size = ConfigClass.ENTITY_INSERT_BATCH_SIZE
+    if paths is None:
+        paths = {}
+    rows = (get_entity_data(session, request_id, entity, paths) for entity in entities)
+    count = 0
+    deltas = {key: 0 for key in SUMMARY_COUNTERS}
+    rollups = {}
+    for batch in chunks(rows, batch_size):
+        if commit and not lock_ingestion(session, request_id):
+            session.rollback()
+            return count
+        session.execute(insert(EntityModel.__table__).values(batch))
+        for key, value in get_ingestion_deltas(batch).items():
+            deltas[key] += value
+        add_ingestion_rollups(rollups, batch)
+        count += len(batch)
+        if commit:
+            increment_request_summary(session, request_id, deltas)
+            increment_folder_rollups(session, request_id, rollups)
+            touch_ingestion(session, request_id)
+            session.commit()
+            deltas = {key: 0 for key in SUMMARY_COUNTERS}
+            rollups = {}
+    increment_request_summary(session, request_id, deltas)
+    increment_folder_rollups(session, request_id, rollups)
+    return count
+
+
+def get_pending_query(request_id: str):
+    # Pending files that are not archived in neo4j, served from the pending partial index
+    return db.session.query(EntityModel.entity_geid).filter_by(
+        request_id=request_id, review_status="pending", archived=False
+    )
+
+
+def set_archived_state(session: Session, request_id: str, file_geids: list[str], archived: bool) -> list[str]:
+    # Flips the archived state of the pending files in file_geids that are not in it yet, returns their paths
+    entity_table = EntityModel.__table__
+    paths = []
+    for geids in chunks(file_geids, ConfigClass.ENTITY_UPDATE_CHUNK_SIZE):
+        files = update(entity_table).where(
+            entity_table.c.request_id == request_id,
+            entity_table.c.review_status == "pending",
+            entity_table.c.archived == (not archived),
+            get_geids_filter(geids),
+        ).values(archived=archived).returning(entity_table.c.path)
+        paths.extend(i.path for i in session.execute(files))
+    return paths
+
+
+def get_stale_archived_geids(session: Session, request_id: str, max_age: int = None) -> list[str]:
+    # Pending files whose archived state wasn't synced with neo4j in the last max_age seconds,
+    # max_age of 0 returns every pending file
+    if max_age is None:
+        max_age = ConfigClass.ARCHIVED_SYNC_INTERVAL
+    stale_files = session.query(EntityModel.entity_geid).filter_by(request_id=request_id, review_status="pending")
+    if max_age > 0:
+        stale_files = stale_files.filter(or_(
+            EntityModel.archived_synced_at.is_(None),
+            EntityModel.archived_synced_at < datetime.utcnow() - timedelta(seconds=max_age),
+        ))
+    return [i.entity_geid for i in stale_files]
+
+
+def update_archived_state(session: Session, request_id: str, stale_geids: list[str], nodes: list[dict]) -> int:
+    # Applies the archived state of the neo4j nodes of stale_geids, files restored in neo4j are pending again.
+    # Returns the number of files whose state changed
+    now = datetime.utcnow()
+    lock_request_summary(session, request_id)
+    archived_geids = [i["global_entity_id"] for i in nodes if i["archived"]]
+    restored_geids = [i["global_entity_id"] for i in nodes if not i["archived"]]
+    archived_paths = set_archived_state(session, request_id, archived_geids, True)
+    restored_paths = set_archived_state(session, request_id, restored_geids, False)
+    increment_request_summary(session, request_id, {
+        "pending_count": len(restored_paths) - len(archived_paths),
+        "archived_count": len(archived_paths) - len(restored_paths),
+    })
+    rollups = {}
+    for path in archived_paths:
+        add_rollup_deltas(rollups, path, {"pending_count": -1})
+    for path in restored_paths:
+        add_rollup_deltas(rollups, path, {"pending_count": 1})
+    increment_folder_rollups(session, request_id, rollups)
+    for geids in chunks(stale_geids, ConfigClass.ENTITY_UPDATE_CHUNK_SIZE):
+        session.query(EntityModel).filter_by(request_id=request_id).filter(
+            get_geids_filter(geids)
+        ).update({"archived_synced_at": now}, synchronize_session=False)
+    session.commit()
+    return len(archived_paths) + len(restored_paths)
+
+
+def get_entity_count(session: Session, request_id: str) -> int:
+    summary = session.query(RequestSummaryModel).filter_by(request_id=request_id).first()
+    if not summary:
+        return session.query(EntityModel).filter_by(request_id=request_id).count()
+    return sum([
+        summary.pending_count,
+        summary.archived_count,
+        summary.approved_count,
+        summary.denied_count,
+        summary.folder_count,
+    ])
+
+
+def lock_ingestion(session: Session, request_id: str) -> bool:
+    # Share lock on the request row until the end of the transaction, False when it isn't ingesting anymore.
+    # A status change waits for the transaction so no entity is committed after the cleanup of a failed request
+    locked = session.query(RequestModel.id).filter_by(id=request_id, status="ingesting").with_for_update(read=True)
+    return locked.first() is not None
+
+
+def add_discovered_entities(session: Session, request_id: str, count: int) -> bool:
+    # Adds entities found by the traversal to the progress and touches the heartbeat in a transaction
+    # of its own, nothing is written when the request left the ingesting state
+    if not lock_ingestion(session, request_id):
+        session.rollback()
+        return False
+    increment_request_summary(session, request_id, {"discovered_count": count})
+    touch_ingestion(session, request_id)
+    session.commit()
+    return True
+
+
+def touch_ingestion(session: Session, request_id: str):
+    # Heartbeat of an asynchronous ingestion, committed with its progress
+    session.query(RequestSummaryModel).filter_by(request_id=request_id).update(
+        {"heartbeat_at": datetime.utcnow()}, synchronize_session=False
+    )
+
+
+def finish_ingestion(session: Session, request_id: str) -> bool:
+    # Moves an ingested request to pending, False when it left the ingesting state meanwhile
+    finished = session.query(RequestModel).filter_by(id=request_id, status="ingesting").update(
+        {"status": "pending"}, synchronize_session=False
+    )
+    session.commit()
+    return bool(finished)
+
+
+def fail_ingestion(session: Session, request_id: str) -> bool:
+    '''
+    Marks an ingesting request failed and removes the entities its ingestion committed so far,
+    False when the request left the ingesting state meanwhile
+    '''
+    failed = session.query(RequestModel).filter_by(id=request_id, status="ingesting").update(
+        {"status": "failed"}, synchronize_session=False
+    )
+    session.commit()
+    if not failed:
+        return False
+    delete_request_entities(session, request_id)
+    session.query(RequestSummaryModel).filter_by(request_id=request_id).update(
+        {key: 0 for key in SUMMARY_COUNTERS}, synchronize_session=False
+    )
+    session.commit()
+    return True
+
+
+def is_ingestion_stale(session: Session, request_obj: RequestModel, timeout: int = None) -> bool:
+    # No progress for timeout seconds since the last batch, or since submission before the first one
+    if timeout is None:
+        timeout = ConfigClass.INGESTION_TIMEOUT
+    heartbeat_at = session.query(RequestSummaryModel.heartbeat_at).filter_by(request_id=request_obj.id).scalar()
+    last_progress = heartbeat_at or request_obj.submitted_at
+    return request_obj.status == "ingesting" and last_progress < datetime.utcnow() - timedelta(seconds=timeout)
+
+
+def get_ingestion_progress(session: Session, request_id: str) -> dict:
+    # Entities found in neo4j and entities inserted so far, read from the summary committed by every batch
+    summary = session.query(RequestSummaryModel).filter_by(request_id=request_id).populate_existing().first()
+    return {
+        "discovered_count": summary.discovered_count if summary else 0,
+        "inserted_count": get_entity_count(session, request_id),
+    }
+
+
+def delete_request_sql(session: Session, request_id: str) -> int:
+    # Entities and the summary row are removed by the ON DELETE CASCADE foreign keys
+    deleted = session.query(RequestModel).filter_by(id=request_id).delete(synchronize_session=False)
+    session.commit()
+    return deleted
+
+
+def soft_delete_request(session: Session, request_id: str):
+    # Hides the request from the listings until the purge removes it
+    session.query(RequestModel).filter_by(id=request_id).update(
+        {"status": "deleted"}, synchronize_session=False
+    )
+    session.commit()
+
+
+def delete_request_entities(session: Session, request_id: str, chunk_size: int = None):
+    # Deletes the entities of a request in chunks, each in its own transaction
+    chunk_size = chunk_size or ConfigClass.ENTITY_DELETE_CHUNK_SIZE
+    while True:
+        chunk = session.query(EntityModel.id).filter_by(request_id=request_id).limit(chunk_size)
+        deleted = session.query(EntityModel).filter(
+            EntityModel.request_id == request_id,
+            EntityModel.id.in_(chunk.scalar_subquery()),
+        ).delete(synchronize_session=False)
+        session.commit()
+        if deleted < chunk_size:
+            break
@@ -0,0 +1,84 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+import argparse
+
+from datetime import datetime, timedelta
+from fastapi_sqlalchemy import DBSessionMiddleware, db
+from sqlalchemy import insert, select
+
+from app.commons.logger_services.logger_factory_service import SrvLoggerFactory
+from app.config import ConfigClass
+from app.models.copy_request_sql import EntityArchiveModel, EntityModel, RequestArchiveModel, RequestModel
+
+logger = SrvLoggerFactory("archive").get_logger()
+
+
+def get_archivable_requests_query(max_age_days: int):
+    completed_before = datetime.utcnow() - timedelta(days=max_age_days)
+    return db.session.query(RequestModel.id).filter(
+        RequestModel.status == "complete",
+        RequestModel.completed_at < completed_before,
+    ).order_by(RequestModel.completed_at.asc())
+
+
+def copy_rows_statement(model, archive_model, *filters):
+    # INSERT INTO archive SELECT FROM hot, rows never leave the database
+    columns = archive_model.__table__.columns.keys()
+    rows = select(*[model.__table__.c[i] for i in columns]).where(*filters)
+    return insert(archive_model.__table__).from_select(columns, rows)
+
+
+def archive_request(request_id: str):
+    '''
+    Moves a request and its entities to the archive tables in one transaction
+    '''
+    db.session.execute(copy_rows_statement(RequestModel, RequestArchiveModel, RequestModel.id == request_id))
+    db.session.execute(copy_rows_statement(EntityModel, EntityArchiveModel, EntityModel.request_id == request_id))
+    # Entities and the summary row are removed by the ON DELETE CASCADE foreign keys
+    db.session.query(RequestModel).filter_by(id=request_id).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def archive_completed_requests(max_age_days: int = None, limit: int = None) -> int:
+    if max_age_days is None:
+        max_age_days = ConfigClass.ARCHIVE_AFTER_DAYS
+    request_ids = [i.id for i in get_archivable_requests_query(max_age_days).limit(limit)]
+    for request_id in request_ids:
+        logger.info(f"Archiving request {request_id}")
+        archive_request(request_id)
+    return len(request_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move completed requests to the archive tables")
+    parser.add_argument("--max-age-days", type=int, default=ConfigClass.ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    # Sets up the engine and session factory used by db outside of the app
+    DBSessionMiddleware(None, db_url=ConfigClass.RDS_DB_URI)
+    with db():
+        count = archive_completed_requests(args.max_age_days, args.limit)
+    logger.info(f"Archived {count} requests")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+import csv
+import io
+import json
+
+from typing import AsyncIterator
+
+from fastapi import Request
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.commons.neo4j_services import async_neo4j
+from app.commons.psql_services import (delete_request_entities, delete_request_sql, get_ancestors_query,
+                                       get_cached_routing, get_pending_query, get_routing_data,
+                                       get_stale_archived_geids, set_cached_routing, update_archived_state)
+from app.commons.psql_services.pagination import decode_cursor, get_page, get_page_query
+from app.commons.psql_services.pool import MeteredAsyncPool, MeteredReplicaPool, get_async_engine_args
+from app.commons.psql_services.query_plan import Explain
+from app.commons.psql_services.replica import use_primary
+from app.config import ConfigClass
+from app.models.copy_request_sql import EntityModel, RequestSummaryModel
+
+# asyncio versions of the queries on an asyncpg engine, queries are still built by the query builders
+# with the request's fastapi_sqlalchemy session, building an ORM query doesn't use a connection,
+# only the statement is executed on the async session. The writes of psql_services run on it through run_sync
+
+
+def get_async_db_uri(uri: str = None) -> str:
+    uri = uri or ConfigClass.RDS_ASYNC_DB_URI or ConfigClass.RDS_DB_URI
+    for driver in ["postgresql+psycopg2://", "postgresql://", "postgres://"]:
+        if uri.startswith(driver):
+            return "postgresql+asyncpg://" + uri[len(driver):]
+    return uri
+
+
+# One engine per database for the process, asyncpg connections belong to the loop they were opened on
+# and the app serves every request on the same loop
+sessionmakers = {}
+
+
+def get_uri_sessionmaker(uri: str, poolclass=MeteredAsyncPool) -> sessionmaker:
+    if uri not in sessionmakers:
+        engine = create_async_engine(get_async_db_uri(uri), **get_async_engine_args(poolclass))
+        sessionmakers[uri] = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    return sessionmakers[uri]
+
+
+def get_async_sessionmaker() -> sessionmaker:
+    return get_uri_sessionmaker(ConfigClass.RDS_ASYNC_DB_URI or ConfigClass.RDS_DB_URI)
+
+
+def get_async_replica_sessionmaker() -> sessionmaker:
+    return get_uri_sessionmaker(ConfigClass.RDS_REPLICA_DB_URI, MeteredReplicaPool)
+
+
+async def dispose_engines():
+    # Closes the pooled connections on shutdown
+    for session_factory in sessionmakers.values():
+        await session_factory.kw["bind"].dispose()
+    sessionmakers.clear()
+
+
+async def get_async_session() -> AsyncIterator[AsyncSession]:
+    # FastAPI dependency, one session per request
+    async with get_async_sessionmaker()() as session:
+        yield session
+
+
+def get_read_sessionmaker(request: Request) -> sessionmaker:
+    # Replica unless use_primary
+    if use_primary(request):
+        return get_async_sessionmaker()
+    return get_async_replica_sessionmaker()
+
+
+async def get_async_read_session(request: Request) -> AsyncIterator[AsyncSession]:
+    # FastAPI dependency of the read only endpoints
+    async with get_read_sessionmaker(request)() as session:
+        yield session
+
+
+async def get_estimated_total(session: AsyncSession, query) -> int:
+    plan = (await session.execute(Explain(query.order_by(None).statement))).scalar()[0]
+    return int(plan["Plan"]["Plan Rows"])
+
+
+async def paginate_query(session: AsyncSession, query, columns: list, page: int, page_size: int,
+                         cursor: str = None, total_mode: str = "exact"):
+    '''
+    Returns a page of rows, the cursor of the next page and the total number of rows
+    A cursor seeks straight to the rows after it so the cost doesn't grow with the page number,
+    without one page and page_size are used
+    total_mode exact counts in the same statement as the first page, estimate uses the planner estimate
+    and none skips the total
+    '''
+    after, total = decode_cursor(cursor, columns) if cursor else (None, None)
+    count = total_mode == "exact" and total is None
+    page_query = get_page_query(query, columns, page, page_size, after, count)
+    result = await session.execute(page_query.statement)
+    # Without the total column the rows hold the entity alone
+    rows = result.all() if count else result.scalars().all()
+    results, next_cursor, total = get_page(rows, columns, page_size, count, total)
+    if count and not rows:
+        # Past the last page the total can't be read from the page rows
+        total = 0
+        if page or cursor:
+            total = await session.scalar(query.with_entities(func.count()).order_by(None).statement)
+    elif total_mode == "estimate":
+        total = await get_estimated_total(session, query)
+    elif total_mode == "none":
+        total = None
+    return results, next_cursor, total
+
+
+async def get_routing(session: AsyncSession, request_id: str, folder_geid: str, model=EntityModel) -> list[dict]:
+    routing = get_cached_routing(request_id, folder_geid)
+    if routing is None:
+        ancestors = await session.execute(get_ancestors_query(request_id, folder_geid, model).statement)
+        routing = [get_routing_data(i) for i in ancestors.scalars()]
+        set_cached_routing(request_id, folder_geid, routing)
+    return routing
+
+
+async def get_pending_count(session: AsyncSession, request_id: str) -> int:
+    pending_count = await session.scalar(
+        select(RequestSummaryModel.pending_count).where(RequestSummaryModel.request_id == request_id)
+    )
+    if pending_count is None:
+        # Requests created before the summary table, the summary is filled on their next write
+        pending_query = get_pending_query(request_id)
+        pending_count = await session.scalar(pending_query.with_entities(func.count()).statement)
+    return pending_count
+
+
+async def get_pending_geids(session: AsyncSession, request_id: str) -> list[str]:
+    return list((await session.execute(get_pending_query(request_id).statement)).scalars())
+
+
+async def refresh_archived_state(session: AsyncSession, request_id: str, max_age: int = None) -> int:
+    # Re-check the archived state of pending files against neo4j for rows not synced in the last max_age seconds,
+    # neo4j is called outside of the transaction
+    stale_geids = await session.run_sync(get_stale_archived_geids, request_id, max_age)
+    if not stale_geids:
+        return 0
+    nodes = [i async for i in async_neo4j.bulk_get_by_geids(stale_geids)]
+    return await session.run_sync(update_archived_state, request_id, stale_geids, nodes)
+
+
+async def purge_request(request_id: str, chunk_size: int = None):
+    '''
+    Deletes the entities of a request in chunks, each in its own transaction, then the request itself
+    Runs after the response is sent so it opens its own session
+    '''
+    async with get_async_sessionmaker()() as session:
+        await session.run_sync(delete_request_entities, request_id, chunk_size)
+        await session.run_sync(delete_request_sql, request_id)
+
+
+async def stream_entities(session: AsyncSession, statement, fetch_size: int = None) -> AsyncIterator[list]:
+    '''
+    Entities of statement in lists of fetch_size read from a server side cursor, memory stays flat
+    whatever the number of rows
+    '''
+    fetch_size = fetch_size or ConfigClass.EXPORT_FETCH_SIZE
+    result = await session.stream(statement.execution_options(yield_per=fetch_size))
+    async for entities in result.scalars().partitions(fetch_size):
+        yield entities
+        # Rows already sent don't need to stay in the identity map
+        session.expunge_all()
+
+
+async def export_ndjson(session: AsyncSession, statement) -> AsyncIterator[str]:
+    async for entities in stream_entities(session, statement):
+        yield "".join(json.dumps(i.to_dict()) + "\n" for i in entities)
+
+
+async def export_csv(session: AsyncSession, statement, columns: list[str]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    async for entities in stream_entities(session, statement):
+        writer.writerows(i.to_dict() for i in entities)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header only when there are no rows
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,141 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+import base64
+import json
+import math
+import uuid
+
+from datetime import datetime
+from sqlalchemy import and_, false, func, literal, or_, tuple_
+from sqlalchemy.types import DateTime
+
+from app.models.base import EAPIResponseCode
+from app.resources.error_handler import APIException
+
+
+def encode_cursor(values: list, total: int = None) -> str:
+    # Opaque continuation token holding the sort key of the last row of a page and the total of the first page
+    data = json.dumps({
+        "after": [str(i) if isinstance(i, (datetime, uuid.UUID)) else i for i in values],
+        "total": total,
+    })
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_cursor(cursor: str, columns: list) -> tuple[list, int]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        values, total = data["after"], data["total"]
+        if len(values) != len(columns):
+            raise ValueError("cursor does not match the sort order")
+        result = []
+        for (column, _), value in zip(columns, values):
+            if value is not None and isinstance(column.type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif value is not None and getattr(column.type, "as_uuid", False):
+                value = uuid.UUID(value)
+            result.append(value)
+        return result, total
+    except Exception:
+        raise APIException(EAPIResponseCode.bad_request.value, f"Invalid cursor: {cursor}")
+
+
+def get_after_filter(column, desc: bool, value):
+    # Postgres sorts NULLs last ascending and first descending
+    if desc:
+        return column.isnot(None) if value is None else column < value
+    return false() if value is None else or_(column > value, column.is_(None))
+
+
+def get_equal_filter(column, value):
+    return column.is_(None) if value is None else column == value
+
+
+def get_row_filter(columns: list, values: list, desc: bool):
+    # (a, b) > (x, y) as one row comparison, an index on (a, b) turns it into a range
+    after = tuple_(*[literal(value, column.type) for (column, _), value in zip(columns, values)])
+    row = tuple_(*[column for column, _ in columns])
+    return row < after if desc else row > after
+
+
+def get_keyset_filter(columns: list, values: list):
+    '''
+    Rows sorted after values, columns is a list of (column, desc) ending with a unique column
+    A sort in a single direction is a row comparison. Descending, NULLs sort first and the row comparison
+    leaves them out as it should, ascending they sort last so every column has to be NOT NULL.
+    Other sorts are expanded, (a, b) after (x, y) is a > x OR (a = x AND b > y), bounded on the first column
+    '''
+    directions = {desc for _, desc in columns}
+    desc = columns[0][1]
+    if len(directions) == 1 and None not in values and (
+        desc or not any(column.expression.nullable for column, _ in columns)
+    ):
+        return get_row_filter(columns, values, desc)
+    clauses = []
+    for i, (column, column_desc) in enumerate(columns):
+        equal = [get_equal_filter(c, v) for (c, _), v in zip(columns[:i], values[:i])]
+        clauses.append(and_(*equal, get_after_filter(column, column_desc, values[i])))
+    first = columns[0][0]
+    if values[0] is not None and (desc or not first.expression.nullable):
+        return and_(first <= values[0] if desc else first >= values[0], or_(*clauses))
+    return or_(*clauses)
+
+
+def get_order_by(columns: list) -> list:
+    return [column.desc() if desc else column.asc() for column, desc in columns]
+
+
+def get_total_column(query):
+    # Uncorrelated subquery, postgres evaluates it once as an InitPlan of the page query.
+    # Auto correlation would drop its FROM since the page query reads the same table
+    return query.with_entities(func.count()).order_by(None).scalar_subquery().correlate(None).label("total")
+
+
+def get_num_of_pages(total: int, page_size: int) -> int:
+    if total is None:
+        return None
+    return math.ceil(total / page_size)
+
+
+def get_page_query(query, columns: list, page: int, page_size: int, after: list = None, count: bool = False):
+    # One row more than the page size tells if there is a next page, after is the decoded cursor.
+    # Only the first page counts, the cursor carries the total to the next ones
+    page_query = query.order_by(*get_order_by(columns))
+    if count:
+        page_query = page_query.add_columns(get_total_column(query))
+    if after is not None:
+        page_query = page_query.filter(get_keyset_filter(columns, after))
+    else:
+        page_query = page_query.offset(page * page_size)
+    return page_query.limit(page_size + 1)
+
+
+def get_page(rows: list, columns: list, page_size: int, count: bool = False, total: int = None):
+    # Entities, next cursor and total read from the rows of get_page_query, total is the one of the cursor
+    if count:
+        total = rows[0].total if rows else None
+        rows = [i[0] for i in rows]
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column, _ in columns], total)
+    return rows, next_cursor, total
@@ -0,0 +1,148 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+import threading
+import time
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.config import ConfigClass
+
+# Latest pool of each engine by name, pools are replaced when an engine is disposed
+pools = {}
+
+
+class MeteredPoolMixin():
+    '''
+    Counts checkouts, checkouts that had to wait for a connection to be returned and checkout timeouts
+    '''
+    name = ""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.timeouts = 0
+        self.max_overflow_seen = 0
+        self._metrics_lock = threading.Lock()
+        pools[self.name] = self
+
+    def _do_get(self):
+        # No idle connection and no room to overflow, the checkout blocks until one is returned
+        waiting = self.checkedin() == 0 and -1 < self._max_overflow <= self.overflow()
+        started = time.monotonic()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            with self._metrics_lock:
+                self.timeouts += 1
+            raise
+        with self._metrics_lock:
+            self.checkouts += 1
+            if waiting:
+                self.waits += 1
+                self.wait_seconds += time.monotonic() - started
+            self.max_overflow_seen = max(self.max_overflow_seen, self.overflow())
+        return connection
+
+    def metrics(self) -> dict:
+        with self._metrics_lock:
+            return {
+                "size": self.size(),
+                "checked_in": self.checkedin(),
+                "checked_out": self.checkedout(),
+                "overflow": self.overflow(),
+                "max_overflow": self._max_overflow,
+                "max_overflow_seen": self.max_overflow_seen,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_seconds": round(self.wait_seconds, 3),
+                "timeouts": self.timeouts,
+            }
+
+
+class MeteredQueuePool(MeteredPoolMixin, QueuePool):
+    name = "sync"
+
+
+class MeteredAsyncPool(MeteredPoolMixin, AsyncAdaptedQueuePool):
+    name = "async"
+
+
+class MeteredReplicaPool(MeteredPoolMixin, AsyncAdaptedQueuePool):
+    name = "async_replica"
+
+
+def pool_stats() -> dict:
+    return {name: pool.metrics() for name, pool in pools.items()}
+
+
+def get_pool_args() -> dict:
+    return {
+        "pool_size": ConfigClass.RDS_POOL_SIZE,
+        "max_overflow": ConfigClass.RDS_MAX_OVERFLOW,
+        "pool_timeout": ConfigClass.RDS_POOL_TIMEOUT,
+        "pool_recycle": ConfigClass.RDS_POOL_RECYCLE,
+        "pool_pre_ping": ConfigClass.RDS_POOL_PRE_PING,
+    }
+
+
+def get_engine_args() -> dict:
+    # psycopg2 engine of DBSessionMiddleware, psycopg2 doesn't use server side prepared statements
+    engine_args = {"poolclass": MeteredQueuePool, **get_pool_args()}
+    if ConfigClass.RDS_STATEMENT_TIMEOUT and not ConfigClass.RDS_PGBOUNCER:
+        engine_args["connect_args"] = {"options": f"-c statement_timeout={ConfigClass.RDS_STATEMENT_TIMEOUT}"}
+    return engine_args
+
+
+def get_async_engine_args(poolclass=MeteredAsyncPool) -> dict:
+    engine_args = {"poolclass": poolclass, **get_pool_args()}
+    if ConfigClass.RDS_PGBOUNCER:
+        # Prepared statements live on a server connection, pgbouncer hands out a different one per transaction
+        engine_args["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+    elif ConfigClass.RDS_STATEMENT_TIMEOUT:
+        engine_args["connect_args"] = {
+            "server_settings": {"statement_timeout": str(ConfigClass.RDS_STATEMENT_TIMEOUT)}
+        }
+    return engine_args
+
+
+def set_local_statement_timeout(connection):
+    # Runs on the DBAPI connection, the transaction starts with this statement and the setting ends with it
+    cursor = connection.connection.cursor()
+    cursor.execute(f"SET LOCAL statement_timeout = {int(ConfigClass.RDS_STATEMENT_TIMEOUT)}")
+    cursor.close()
+
+
+def setup_statement_timeout(engine: Engine):
+    # Session settings don't survive pgbouncer transaction pooling, the timeout is set in every transaction
+    if ConfigClass.RDS_PGBOUNCER and ConfigClass.RDS_STATEMENT_TIMEOUT:
+        if not event.contains(engine, "begin", set_local_statement_timeout):
+            event.listen(engine, "begin", set_local_statement_timeout)
+
+
+def create_sync_engine(db_url: str) -> Engine:
+    # psycopg2 engine of DBSessionMiddleware
+    engine = create_engine(db_url, **get_engine_args())
+    setup_statement_timeout(engine)
+    return engine
@@ -0,0 +1,51 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+from fastapi_sqlalchemy import db
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+
+class Explain(Executable, ClauseElement):
+    '''
+    EXPLAIN (FORMAT JSON) of a statement, bind parameters are rendered by the wrapped statement
+    '''
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def get_query_plan(query) -> dict:
+    # Planner output for an ORM query, the top plan node with its nested "Plans"
+    return db.session.execute(Explain(query.statement)).scalar()[0]
+
+
+def get_plan_nodes(plan: dict) -> list[dict]:
+    # Flatten a plan node and all the nodes under it
+    nodes = [plan.get("Plan", plan)]
+    for child in nodes[0].get("Plans", []):
+        nodes.extend(get_plan_nodes(child))
+    return nodes
@@ -0,0 +1,54 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+import time
+
+from fastapi import Request, Response
+
+from app.config import ConfigClass
+
+# Reads that must see a preceding write pass consistent=true, that is the supported way to get
+# read-your-writes and the one backend callers (portal, pipeline) have to use since they don't keep cookies.
+# Browsers also get this cookie on every write, while it is valid their reads go to the primary
+PRIMARY_COOKIE = "approval_primary_until"
+SAFE_METHODS = ["GET", "HEAD", "OPTIONS"]
+
+
+def set_primary_cookie(response: Response):
+    primary_until = time.time() + ConfigClass.RDS_REPLICA_STICKY_SECONDS
+    response.set_cookie(PRIMARY_COOKIE, str(primary_until), max_age=ConfigClass.RDS_REPLICA_STICKY_SECONDS)
+
+
+def use_primary(request: Request) -> bool:
+    if not ConfigClass.RDS_REPLICA_DB_URI:
+        return True
+    if request.query_params.get("consistent", "").lower() in ["1", "true"]:
+        return True
+    try:
+        return float(request.cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+async def sticky_primary_middleware(request: Request, call_next):
+    response = await call_next(request)
+    if request.method not in SAFE_METHODS and response.status_code < 400:
+        set_primary_cookie(response)
+    return response
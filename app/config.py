@@ -69,12 +69,70 @@ class Settings(BaseSettings):
 
     RDS_SCHEMA_DEFAULT: str
     RDS_DB_URI: str
+    # asyncpg uri of the async handlers, derived from RDS_DB_URI when empty
+    RDS_ASYNC_DB_URI: str = ""
+    # Read replica of the GET endpoints, reads go to the primary when empty
+    RDS_REPLICA_DB_URI: str = ""
+    # Seconds a cookie keeping client reads from the primary after one of its writes, other clients pass consistent
+    RDS_REPLICA_STICKY_SECONDS: int = 10
+    # Number of hash partitions of approval_entity on request_id, 0 keeps a single table (partitions need postgres 11+)
+    RDS_ENTITY_PARTITIONS: int = 0
+
+    # Connection pool of each engine, timeouts in seconds
+    RDS_POOL_SIZE: int = 5
+    RDS_MAX_OVERFLOW: int = 10
+    RDS_POOL_TIMEOUT: float = 30
+    RDS_POOL_RECYCLE: int = 1800
+    RDS_POOL_PRE_PING: bool = True
+    # Milliseconds, 0 disables the timeout
+    RDS_STATEMENT_TIMEOUT: int = 0
+    # Behind pgbouncer in transaction pooling: no server side prepared statements or session settings
+    RDS_PGBOUNCER: bool = False
 
     EMAIL_SUPPORT: str = "jzhang@indocresearch.org"
 
     CORE_ZONE_LABEL: str
     GREEN_ZONE_LABEL: str
 
+    # Outbound http calls
+    HTTP_CONNECT_TIMEOUT: float = 5
+    HTTP_READ_TIMEOUT: float = 60
+    HTTP_POOL_CONNECTIONS: int = 10
+    HTTP_POOL_MAXSIZE: int = 20
+    HTTP_MAX_RETRIES: int = 3
+    HTTP_RETRY_BACKOFF: float = 0.5
+
+    # Neo4j lookup caches, ttl in seconds, 0 disables the cache
+    CACHE_MAXSIZE: int = 1024
+    CACHE_NODE_TTL: int = 60
+    CACHE_PROJECT_TTL: int = 300
+    # Breadcrumbs of request folders, a request's tree doesn't change after creation
+    CACHE_ROUTING_TTL: int = 3600
+
+    # Seconds before the archived state of a pending file is re-checked against neo4j
+    ARCHIVED_SYNC_INTERVAL: int = 300
+    # Max number of rows in a single entity INSERT statement
+    ENTITY_INSERT_BATCH_SIZE: int = 1000
+    # Max number of geids in a single entity UPDATE statement
+    ENTITY_UPDATE_CHUNK_SIZE: int = 5000
+    # Requests with more entities than this are deleted by a background purge
+    ENTITY_PURGE_THRESHOLD: int = 10000
+    # Max number of entity rows removed in a single DELETE statement of a purge
+    ENTITY_DELETE_CHUNK_SIZE: int = 5000
+    # Seconds without ingestion progress before an ingesting request is considered abandoned and marked failed
+    INGESTION_TIMEOUT: int = 3600
+    # Rows fetched per round trip from the server side cursor of a file export
+    EXPORT_FETCH_SIZE: int = 1000
+    # Days after completion before a request is moved to the archive tables
+    ARCHIVE_AFTER_DAYS: int = 90
+
+    # Max number of folder geids sent in a single relations query
+    NEO4J_RELATION_BATCH_SIZE: int = 500
+    # Max number of geids sent in a single bulk node query
+    NEO4J_BULK_CHUNK_SIZE: int = 1000
+    # Max number of concurrent neo4j calls made by the async service layer
+    NEO4J_MAX_CONCURRENCY: int = 8
+
     def __init__(self, *args: Any, **kwds: Any) -> None:
         super().__init__(*args, **kwds)
 
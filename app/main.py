@@ -25,6 +25,9 @@ from .config import ConfigClass
 from .api_registry import api_registry
 from app.resources.error_handler import APIException
 from fastapi_sqlalchemy import DBSessionMiddleware
+from app.commons.psql_services.async_psql import dispose_engines
+from app.commons.psql_services.pool import create_sync_engine
+from app.commons.psql_services.replica import sticky_primary_middleware
 import os
 
 def create_app():
@@ -38,7 +41,9 @@ def create_app():
         version=ConfigClass.version
     )
 
-    app.add_middleware(DBSessionMiddleware, db_url=ConfigClass.RDS_DB_URI)
+    app.add_middleware(DBSessionMiddleware, custom_engine=create_sync_engine(ConfigClass.RDS_DB_URI))
+    if ConfigClass.RDS_REPLICA_DB_URI:
+        app.middleware("http")(sticky_primary_middleware)
     app.add_middleware(
         CORSMiddleware,
         allow_origins="*",
@@ -51,6 +56,10 @@ def create_app():
     # v1
     api_registry(app)
 
+    @app.on_event("shutdown")
+    async def close_async_engines():
+        await dispose_engines()
+
     @app.exception_handler(APIException)
     async def http_exception_handler(request: Request, exc: APIException):
         return JSONResponse(
@@ -22,9 +22,12 @@ from enum import Enum
 from pydantic import BaseModel, validator, Field, root_validator
 from fastapi.responses import JSONResponse
 
+from app.resources.error_handler import APIException
+
 
 class EAPIResponseCode(Enum):
     success = 200
+    accepted = 202
     internal_error = 500
     bad_request = 400
     not_found = 404
@@ -39,6 +42,7 @@ class APIResponse(BaseModel):
     page: int = 0
     total: int = 1
     num_of_pages: int = 1
+    next_cursor: str = None
     result = []
 
     def json_response(self):
@@ -50,6 +54,17 @@ class APIResponse(BaseModel):
 class PaginationRequest(BaseModel):
     page: int = 0
     page_size: int = 25
+    cursor: str = None
+    # exact, estimate or none
+    total_mode: str = "exact"
+    # Read from the primary even when a replica is configured, needed to see a write made just before
+    consistent: bool = False
     order_type: str = "asc"
     order_by: str = "uploaded_at"
 
+    @validator("total_mode")
+    def valid_total_mode(cls, value):
+        if value not in ["exact", "estimate", "none"]:
+            raise APIException(EAPIResponseCode.bad_request.value, "invalid total mode")
+        return value
+
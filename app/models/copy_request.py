@@ -37,6 +37,8 @@ class POSTRequest(BaseModel):
     source_geid: str
     note: str
     submitted_by: str
+    # Return 202 once the request is saved, the entities are ingested in the background
+    asynchronous: bool = False
 
     @validator('note')
     def valid_note(cls, value):
@@ -59,6 +61,8 @@ class POSTRequestResponse(APIResponse):
 class GETRequest(PaginationRequest):
     status: str
     submitted_by: str = None
+    # Read from the archive tables
+    archive: bool = False
 
 
 class GETRequestResponse(APIResponse):
@@ -72,12 +76,15 @@ class GETRequestResponse(APIResponse):
     })
 
 
-class GETRequestFiles(PaginationRequest):
+class RequestFilesFilter(BaseModel):
     request_id: uuid.UUID
     parent_geid: str = ""
     query: str = "{}"
     partial: str = "[]"
-    order_by: str = "uploaded_at"
+    # contains, icontains, prefix or iprefix
+    partial_match: str = "contains"
+    # Read from the archive tables
+    archive: bool = False
 
     @validator('query', 'partial')
     def valid_json(cls, value):
@@ -88,6 +95,29 @@ class GETRequestFiles(PaginationRequest):
             raise APIException(EAPIResponseCode.bad_request.value, f"Invalid json: {value}")
         return value
 
+    @validator('partial_match')
+    def valid_partial_match(cls, value):
+        if value not in ["contains", "icontains", "prefix", "iprefix"]:
+            raise APIException(EAPIResponseCode.bad_request.value, "invalid partial match")
+        return value
+
+
+class GETRequestFiles(PaginationRequest, RequestFilesFilter):
+    order_by: str = "uploaded_at"
+
+
+class GETRequestFilesExport(RequestFilesFilter):
+    # ndjson or csv
+    export_format: str = "ndjson"
+    # Read from the primary even when a replica is configured, needed to see a write made just before
+    consistent: bool = False
+
+    @validator('export_format')
+    def valid_export_format(cls, value):
+        if value not in ["ndjson", "csv"]:
+            raise APIException(EAPIResponseCode.bad_request.value, "invalid export format")
+        return value
+
 
 class GETRequestFilesResponse(APIResponse):
     result: dict = Field({}, example={
@@ -105,6 +135,7 @@ class PUTRequest(BaseModel):
     status: str
     review_notes: str = ""
     username: str
+    verify: bool = False
 
     @validator('status')
     def valid_status(cls, value):
@@ -153,6 +184,9 @@ class PUTRequestFilesResponse(APIResponse):
 
 class GETRequestPending(BaseModel):
     request_id: uuid.UUID
+    verify: bool = False
+    # Read from the primary even when a replica is configured, needed to see a write made just before
+    consistent: bool = False
 
 
 class GETPendingResponse(APIResponse):
@@ -167,3 +201,22 @@ class GETPendingResponse(APIResponse):
         },
         'total': 1
     })
+
+
+class GETRequestStatus(BaseModel):
+    request_id: uuid.UUID
+
+
+class GETRequestStatusResponse(APIResponse):
+    result: dict = Field({}, example={
+        'code': 200,
+        'error_msg': '',
+        'num_of_pages': 1,
+        'page': 0,
+        'result': {
+            "status": "ingesting",
+            "discovered_count": 10,
+            "inserted_count": 5,
+        },
+        'total': 1
+    })
@@ -19,7 +19,8 @@
 # 
 
 from fastapi_sqlalchemy import db
-from sqlalchemy import Column, String, Date, DateTime, Integer, Boolean, ForeignKey, BigInteger
+from sqlalchemy import Column, String, Date, DateTime, Integer, Boolean, ForeignKey, BigInteger, Index, text
+from sqlalchemy import DDL, event
 from sqlalchemy.sql.schema import UniqueConstraint
 from sqlalchemy.dialects.postgresql import UUID
 from app.config import ConfigClass
@@ -29,9 +30,10 @@ from uuid import uuid4
 
 Base = declarative_base()
 
-class RequestModel(Base):
-    __tablename__ = "approval_request"
-    __table_args__ = {"schema": ConfigClass.RDS_SCHEMA_DEFAULT}
+class RequestColumns():
+    '''
+    Columns of a request, shared by the hot and the archive table
+    '''
     id = Column(UUID(as_uuid=True), unique=True, primary_key=True, default=uuid4)
     status = Column(String())
     submitted_by = Column(String())
@@ -61,11 +63,31 @@ class RequestModel(Base):
         return result
 
 
-class EntityModel(Base):
-    __tablename__ = "approval_entity"
-    __table_args__ = {"schema": ConfigClass.RDS_SCHEMA_DEFAULT}
-    id = Column(UUID(as_uuid=True), unique=True, primary_key=True, default=uuid4)
-    request_id = Column(UUID(as_uuid=True), ForeignKey(RequestModel.id))
+class RequestModel(RequestColumns, Base):
+    __tablename__ = "approval_request"
+    __table_args__ = (
+        Index("approval_request_project_status_idx", "project_geid", "status", "submitted_at"),
+        Index("approval_request_project_status_user_idx", "project_geid", "status", "submitted_by", "submitted_at"),
+        {"schema": ConfigClass.RDS_SCHEMA_DEFAULT},
+    )
+
+
+ENTITY_PARTITIONS = ConfigClass.RDS_ENTITY_PARTITIONS
+
+
+def get_entity_table_kwargs() -> dict:
+    kwargs = {"schema": ConfigClass.RDS_SCHEMA_DEFAULT}
+    if ENTITY_PARTITIONS:
+        kwargs["postgresql_partition_by"] = "HASH (request_id)"
+    return kwargs
+
+
+class EntityColumns():
+    '''
+    Columns of a request entity, shared by the hot and the archive table
+    '''
+    # Unique constraints of a partitioned table must include the partition key
+    id = Column(UUID(as_uuid=True), unique=not ENTITY_PARTITIONS, primary_key=True, default=uuid4)
     entity_geid = Column(String())
     entity_type = Column(String())
     review_status = Column(String())
@@ -78,15 +100,126 @@ class EntityModel(Base):
     dcm_id = Column(String(), nullable=True)
     uploaded_at = Column(DateTime(), default=datetime.utcnow)
     file_size = Column(BigInteger(), nullable=True)
+    archived = Column(Boolean(), nullable=False, default=False, server_default="false")
+    archived_synced_at = Column(DateTime(), nullable=True)
+    # Geids from the top level entity of the request down to this entity: /<geid>/<geid>/
+    path = Column(String(), nullable=True)
+    # Rollups of the files under a folder at any depth, empty on files
+    file_count = Column(BigInteger(), nullable=True)
+    total_size = Column(BigInteger(), nullable=True)
+    # pending files that are not archived, as pending_count of the request summary
+    pending_count = Column(BigInteger(), nullable=True)
+    approved_count = Column(BigInteger(), nullable=True)
+    denied_count = Column(BigInteger(), nullable=True)
 
     def to_dict(self):
         result = {}
         for field in self.__table__.columns.keys():
             if field == "uploaded_at":
                 result[field] = str(getattr(self, field).isoformat()[:-3] + 'Z')
+            elif field == "archived_synced_at":
+                if getattr(self, field):
+                    result[field] = str(getattr(self, field).isoformat()[:-3] + 'Z')
+                else:
+                    result[field] = None
             elif field in ["id", "request_id"]:
                 result[field] = str(getattr(self, field))
             else:
                 result[field] = getattr(self, field)
         return result
 
+
+class EntityModel(EntityColumns, Base):
+    __tablename__ = "approval_entity"
+    __table_args__ = (
+        # Folder listings and their sort on uploaded_at, the default order of list_request_files
+        Index("approval_entity_listing_idx", "request_id", "parent_geid", "entity_type", "uploaded_at", "id"),
+        Index("approval_entity_request_status_idx", "request_id", "review_status"),
+        Index("approval_entity_request_geid_idx", "request_id", "entity_geid"),
+        Index(
+            "approval_entity_pending_idx",
+            "request_id",
+            postgresql_where=text("review_status = 'pending' AND NOT archived"),
+        ),
+        Index(
+            "approval_entity_path_idx",
+            "request_id",
+            "path",
+            postgresql_ops={"path": "varchar_pattern_ops"},
+        ),
+        # Partial matches of list_request_files, LIKE and ILIKE with any wildcards. They span every request,
+        # btree_gin has no uuid operator class before postgres 11 so request_id can't lead them, the planner
+        # ANDs their bitmap with one of the request_id indexes instead
+        Index("approval_entity_name_trgm_idx", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index(
+            "approval_entity_uploaded_by_trgm_idx",
+            "uploaded_by",
+            postgresql_using="gin",
+            postgresql_ops={"uploaded_by": "gin_trgm_ops"},
+        ),
+        Index(
+            "approval_entity_dcm_id_trgm_idx",
+            "dcm_id",
+            postgresql_using="gin",
+            postgresql_ops={"dcm_id": "gin_trgm_ops"},
+        ),
+        get_entity_table_kwargs(),
+    )
+    request_id = Column(
+        UUID(as_uuid=True), ForeignKey(RequestModel.id, ondelete="CASCADE"), primary_key=bool(ENTITY_PARTITIONS)
+    )
+
+
+# Partitions are created with the table, approval_entity_p0 to approval_entity_p<n-1>
+for remainder in range(ENTITY_PARTITIONS):
+    event.listen(EntityModel.__table__, "after_create", DDL(
+        f"CREATE TABLE %(fullname)s_p{remainder} PARTITION OF %(fullname)s "
+        f"FOR VALUES WITH (MODULUS {ENTITY_PARTITIONS}, REMAINDER {remainder})"
+    ))
+
+
+class RequestArchiveModel(RequestColumns, Base):
+    __tablename__ = "approval_request_archive"
+    __table_args__ = (
+        Index("approval_request_archive_project_status_idx", "project_geid", "status", "submitted_at"),
+        {"schema": ConfigClass.RDS_SCHEMA_DEFAULT},
+    )
+
+
+class EntityArchiveModel(EntityColumns, Base):
+    __tablename__ = "approval_entity_archive"
+    __table_args__ = (
+        Index(
+            "approval_entity_archive_listing_idx", "request_id", "parent_geid", "entity_type", "uploaded_at", "id"
+        ),
+        Index("approval_entity_archive_request_geid_idx", "request_id", "entity_geid"),
+        {"schema": ConfigClass.RDS_SCHEMA_DEFAULT},
+    )
+    request_id = Column(UUID(as_uuid=True), ForeignKey(RequestArchiveModel.id, ondelete="CASCADE"))
+
+
+class RequestSummaryModel(Base):
+    __tablename__ = "approval_request_summary"
+    __table_args__ = {"schema": ConfigClass.RDS_SCHEMA_DEFAULT}
+    request_id = Column(UUID(as_uuid=True), ForeignKey(RequestModel.id, ondelete="CASCADE"), primary_key=True)
+    # pending files that are not archived in neo4j, archived_count holds the archived pending files
+    pending_count = Column(BigInteger(), nullable=False, default=0, server_default="0")
+    archived_count = Column(BigInteger(), nullable=False, default=0, server_default="0")
+    approved_count = Column(BigInteger(), nullable=False, default=0, server_default="0")
+    denied_count = Column(BigInteger(), nullable=False, default=0, server_default="0")
+    total_size = Column(BigInteger(), nullable=False, default=0, server_default="0")
+    approved_size = Column(BigInteger(), nullable=False, default=0, server_default="0")
+    folder_count = Column(BigInteger(), nullable=False, default=0, server_default="0")
+    # entities found in neo4j when the request was created, ingestion is done when all of them are counted above
+    discovered_count = Column(BigInteger(), nullable=False, default=0, server_default="0")
+    # last progress of an asynchronous ingestion, a worker restart leaves it behind
+    heartbeat_at = Column(DateTime(), nullable=True)
+
+    def to_dict(self):
+        result = {}
+        for field in self.__table__.columns.keys():
+            if field == "request_id":
+                result[field] = str(getattr(self, field))
+            else:
+                result[field] = getattr(self, field)
+        return result
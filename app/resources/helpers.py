@@ -18,15 +18,39 @@
 # permissions and limitations under the Licence.
 # 
 
+from app.commons.http_services import get_http_client
 from app.config import ConfigClass
-import requests
+from datetime import datetime, timezone
+from typing import Iterable, Iterator
+import re
 
 
 def get_geid():
     url = ConfigClass.UTILITY_SERVICE + "utility/id"
-    response = requests.get(url)
+    response = get_http_client().get(url)
     if response.status_code == 200:
         return response.json()['result']
     else:
         raise Exception('get_geid {}: {}'.format(response.status_code, url))
 
+
+def chunks(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def parse_time(value) -> datetime:
+    # ISO 8601 time of a neo4j node, the fraction is cut to the microseconds a datetime holds.
+    # asyncpg only binds datetimes to timestamp columns
+    if not isinstance(value, str):
+        return value
+    parsed = datetime.fromisoformat(re.sub(r"(\.\d{6})\d+", r"\1", value).replace("Z", "+00:00"))
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
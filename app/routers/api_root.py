@@ -19,6 +19,8 @@
 # 
 
 from fastapi import APIRouter
+from app.commons.cache_services import cache_stats
+from app.commons.psql_services.pool import pool_stats
 from app.config import ConfigClass
 
 router = APIRouter()
@@ -30,3 +32,19 @@ async def root():
     For testing if service's up
     '''
     return {"message": "Service Approval On, Version: " + ConfigClass.version}
+
+
+@router.get("/cache")
+async def cache():
+    '''
+    Hit and miss counters of the in process caches
+    '''
+    return {"result": cache_stats()}
+
+
+@router.get("/pool")
+async def pool():
+    '''
+    Checkout, wait and overflow counters of the database connection pools
+    '''
+    return {"result": pool_stats()}
@@ -18,21 +18,35 @@
 # permissions and limitations under the Licence.
 # 
 
-import math
+import asyncio
 
-from fastapi import APIRouter, Depends, Request
-from fastapi_sqlalchemy import db
+from typing import AsyncIterator
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Request
+from fastapi.responses import StreamingResponse
 from fastapi_utils import cbv
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.commons.logger_services.logger_factory_service import SrvLoggerFactory
-from app.commons.neo4j_services import bulk_get_by_geids, get_files_recursive, get_node_by_geid
-from app.commons.psql_services import create_entity_from_node, get_all_sub_files, update_files_sql, get_all_sub_folder_nodes
+from app.commons.neo4j_services import async_neo4j
+from app.commons.psql_services import (add_discovered_entities, bulk_create_entities, delete_request_sql,
+                                      fail_ingestion, finish_ingestion, get_all_sub_files, get_all_sub_folder_nodes,
+                                      get_entity_count, get_export_query, get_ingestion_progress,
+                                      get_request_files_query, get_request_summary, get_requests_query,
+                                      increment_request_summary, is_ingestion_stale, soft_delete_request,
+                                      update_files_sql)
+from app.commons.psql_services import async_psql
+from app.commons.psql_services.pagination import get_num_of_pages
 from app.commons.pipeline_ops.copy import trigger_copy_pipeline
+from app.config import ConfigClass
 from app.models.base import APIResponse, EAPIResponseCode
-from app.models.copy_request import (GETRequest, GETRequestFiles, GETRequestFilesResponse, GETRequestResponse,
-                                     PATCHRequestFiles, POSTRequest, POSTRequestResponse, PUTRequest, PUTRequestFiles,
-                                     PUTRequestFilesResponse, GETPendingResponse, GETRequestPending)
-from app.models.copy_request_sql import EntityModel, RequestModel
+from app.models.copy_request import (GETRequest, GETRequestFiles, GETRequestFilesExport, GETRequestFilesResponse,
+                                     GETRequestResponse, GETRequestStatus, GETRequestStatusResponse,
+                                     PATCHRequestFiles, POSTRequest, POSTRequestResponse, PUTRequest,
+                                     PUTRequestFiles, PUTRequestFilesResponse, GETPendingResponse, GETRequestPending)
+from app.models.copy_request_sql import EntityArchiveModel, EntityModel, RequestArchiveModel, RequestModel
+from app.resources.error_handler import APIException
 from datetime import datetime
 from .request_notify import notify_project_admins, notify_user
 
@@ -44,17 +58,152 @@ _API_TAG = "CopyRequest"
 _API_NAMESPACE = "copy_request"
 
 
+async def get_request_roots(data: POSTRequest, semaphore: asyncio.Semaphore) -> tuple[dict, dict, list[dict]]:
+    # Fetch the destination and source folders and the requested entities concurrently
+    async def get_entities() -> list[dict]:
+        return [i async for i in async_neo4j.bulk_get_by_geids(data.entity_geids, semaphore=semaphore)]
+
+    dest_folder_node, source_folder_node, entities = await asyncio.gather(
+        async_neo4j.get_node_by_geid(data.destination_geid, semaphore=semaphore),
+        async_neo4j.get_node_by_geid(data.source_geid, semaphore=semaphore),
+        get_entities(),
+    )
+    for entity in entities:
+        # Top level files in request need a parent_folder_geid of None
+        entity["parent_folder_geid"] = None
+    return dest_folder_node, source_folder_node, entities
+
+
+async def iter_request_nodes(entities: list[dict], semaphore: asyncio.Semaphore) -> AsyncIterator[list[dict]]:
+    # The top level entities, then the entities under their folders in the batches the traversal returns them
+    yield entities
+    folders = [i for i in entities if "File" not in i["labels"]]
+    async for children in async_neo4j.iter_children(folders, semaphore):
+        yield children
+
+
+async def get_request_nodes(data: POSTRequest) -> tuple[dict, dict, list[dict]]:
+    semaphore = async_neo4j.get_semaphore()
+    dest_folder_node, source_folder_node, entities = await get_request_roots(data, semaphore)
+    all_files = [i async for nodes in iter_request_nodes(entities, semaphore) for i in nodes]
+    return dest_folder_node, source_folder_node, all_files
+
+
+async def ingest_entities(session: AsyncSession, request_id: str, data: POSTRequest) -> bool:
+    '''
+    Inserts the entities of a request as the traversal finds them, the discovered count and the heartbeat are
+    committed with every traversal batch and the inserted count with every insert batch.
+    False when the request left the ingesting state, the traversal stops at the next batch
+    '''
+    semaphore = async_neo4j.get_semaphore()
+    dest_folder_node, source_folder_node, entities = await get_request_roots(data, semaphore)
+    await session.execute(update(RequestModel).where(
+        RequestModel.id == request_id, RequestModel.status == "ingesting"
+    ).values(
+        destination_path=dest_folder_node["display_path"],
+        source_path=source_folder_node["display_path"],
+    ).execution_options(synchronize_session=False))
+    paths = {}
+    async for nodes in iter_request_nodes(entities, semaphore):
+        if not await session.run_sync(add_discovered_entities, request_id, len(nodes)):
+            return False
+        inserted = await session.run_sync(bulk_create_entities, request_id, nodes, commit=True, paths=paths)
+        if inserted < len(nodes):
+            return False
+    return True
+
+
+async def ingest_request(request_id: str, project_geid: str, data: POSTRequest):
+    '''
+    Expands and ingests the entities of a request created in the ingesting state, then notifies the project admins
+    Runs after the response is sent so it opens its own session, a request that can't be ingested is marked failed
+    and its partial entities are removed. A request deleted or completed meanwhile is left as it is
+    '''
+    async with async_psql.get_async_sessionmaker()() as session:
+        request_obj = await session.get(RequestModel, request_id)
+        if not request_obj:
+            logger.info(f"Request {request_id} was deleted before its ingestion")
+            return
+        submitted_at = request_obj.submitted_at.strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            finished = await ingest_entities(session, request_id, data)
+            finished = finished and await session.run_sync(finish_ingestion, request_id)
+        except Exception as e:
+            logger.error(f"Error ingesting request {request_id}: {e}")
+            await session.rollback()
+            try:
+                await session.run_sync(fail_ingestion, request_id)
+            except Exception as e:
+                await session.rollback()
+                logger.error(f"Error removing the partial entities of request {request_id}: {e}")
+            return
+    if not finished:
+        logger.info(f"Request {request_id} left the ingesting state during its ingestion")
+        return
+
+    await asyncio.to_thread(notify_project_admins, data.submitted_by, project_geid, submitted_at)
+
+
+async def check_request_ingested(session: AsyncSession, request_id: str, allow_failed: bool = False):
+    # Requests still ingesting or whose ingestion failed don't hold all their entities,
+    # deleted ones are being purged
+    status = await session.scalar(select(RequestModel.status).where(RequestModel.id == request_id))
+    if status in ["ingesting", "deleted"] or (status == "failed" and not allow_failed):
+        raise APIException(EAPIResponseCode.conflict.value, f"Request {request_id} is {status}")
+
+
+def get_auth_headers(request: Request) -> dict:
+    return {
+        "Authorization": request.headers.get("Authorization").replace("Bearer ", ""),
+        "Refresh-Token": request.headers.get("Refresh-Token"),
+    }
+
+
+async def start_copy_pipeline(session: AsyncSession, request_id: str, entity_geids: list[str], username: str,
+                              session_id: str, request: Request) -> dict:
+    # The pipeline call is blocking http, it runs in a worker thread
+    request_obj: RequestModel = await session.get(RequestModel, request_id)
+    return await asyncio.to_thread(
+        trigger_copy_pipeline,
+        str(request_obj.id),
+        request_obj.project_geid,
+        request_obj.source_geid,
+        request_obj.destination_geid,
+        entity_geids,
+        username,
+        session_id,
+        get_auth_headers(request),
+    )
+
+
 @cbv.cbv(router)
 class APICopyRequest:
 
     @router.post("/request/copy/{project_geid}", tags=[_API_TAG], response_model=POSTRequestResponse,
             summary="Create a copy request")
-    def create_request(self, project_geid: str, data: POSTRequest):
+    async def create_request(self, project_geid: str, data: POSTRequest, background_tasks: BackgroundTasks,
+                             session: AsyncSession = Depends(async_psql.get_async_session)):
         logger.info("Create Request called")
         api_response = APIResponse()
 
-        dest_folder_node = get_node_by_geid(data.destination_geid)
-        source_folder_node = get_node_by_geid(data.source_geid)
+        if data.asynchronous:
+            request_obj = RequestModel(
+                status="ingesting",
+                submitted_by=data.submitted_by,
+                destination_geid=data.destination_geid,
+                source_geid=data.source_geid,
+                note=data.note,
+                project_geid=project_geid,
+            )
+            session.add(request_obj)
+            await session.commit()
+            await session.refresh(request_obj)
+            background_tasks.add_task(ingest_request, request_obj.id, project_geid, data)
+            api_response.code = EAPIResponseCode.accepted
+            api_response.result = request_obj.to_dict()
+            return api_response.json_response()
+
+        dest_folder_node, source_folder_node, all_files = await get_request_nodes(data)
         request_data = {
             "status": "pending",
             "submitted_by": data.submitted_by,
@@ -66,138 +215,150 @@ class APICopyRequest:
             "source_path": source_folder_node["display_path"],
         }
         request_obj = RequestModel(**request_data)
-        db.session.add(request_obj)
-        db.session.commit()
-        db.session.refresh(request_obj)
-
-        all_files = []
-        entities = bulk_get_by_geids(data.entity_geids)
-        for entity in entities:
-            if "File" in entity["labels"]:
-                # Top level files in request need a parent_folder_geid of None
-                entity["parent_folder_geid"] = None
-                all_files.append(entity)
-            else:
-                # Top level files in request need a parent_folder_geid of None
-                entity["parent_folder_geid"] = None
-                all_files.append(entity)
-                all_files = get_files_recursive(entity["global_entity_id"], all_files=all_files)
-
-        for entity in all_files:
-            create_entity_from_node(request_obj.id, entity)
+        session.add(request_obj)
+        await session.flush()
+        # The request and all its entities are written in a single transaction
+        await session.run_sync(increment_request_summary, request_obj.id, {"discovered_count": len(all_files)})
+        await session.run_sync(bulk_create_entities, request_obj.id, all_files)
+        await session.commit()
+        await session.refresh(request_obj)
 
         submitted_at = request_obj.submitted_at.strftime("%Y-%m-%d %H:%M:%S")
-        notify_project_admins(data.submitted_by, project_geid, submitted_at)
+        await asyncio.to_thread(notify_project_admins, data.submitted_by, project_geid, submitted_at)
         api_response.result = request_obj.to_dict()
         return api_response.json_response()
 
     @router.get("/request/copy/{project_geid}", tags=[_API_TAG], response_model=GETRequestResponse,
             summary="Create a copy request")
-    def list_requests(self, project_geid: str, params: GETRequest = Depends(GETRequest)):
+    async def list_requests(self, project_geid: str, params: GETRequest = Depends(GETRequest),
+                            session: AsyncSession = Depends(async_psql.get_async_read_session)):
         logger.info("List Requests called")
         api_response = APIResponse()
-        results = db.session.query(RequestModel).filter_by(
-            status=params.status,
-            project_geid=project_geid,
+        model = RequestArchiveModel if params.archive else RequestModel
+        sql_query = get_requests_query(project_geid, params.status, params.submitted_by, model)
+        sort_columns = [(model.submitted_at, True), (model.id, True)]
+        results, next_cursor, total = await async_psql.paginate_query(
+            session, sql_query, sort_columns, params.page, params.page_size, params.cursor, params.total_mode
         )
-        if params.submitted_by:
-            results = results.filter_by(submitted_by=params.submitted_by)
-        results = results.order_by(RequestModel.submitted_at.desc()).limit(params.page_size).offset(params.page * params.page_size)
 
-        if params.submitted_by:
-            total = db.session.query(RequestModel).filter_by(
-                status=params.status,
-                project_geid=project_geid,
-                submitted_by=params.submitted_by
-            ).count()
-        else:
-            total = db.session.query(RequestModel).filter_by(
-                status=params.status,
-                project_geid=project_geid,
-            ).count()
         api_response.result = [i.to_dict() for i in results]
         api_response.total = total
         api_response.page = params.page
-        api_response.num_of_pages = math.ceil(total / params.page_size)
+        api_response.num_of_pages = get_num_of_pages(total, params.page_size)
+        api_response.next_cursor = next_cursor
+        return api_response.json_response()
+
+    @router.get("/request/copy/{project_geid}/status", tags=[_API_TAG], response_model=GETRequestStatusResponse,
+            summary="Get the ingestion progress of a request")
+    async def get_request_status(self, project_geid: str, params: GETRequestStatus = Depends(GETRequestStatus),
+                                 session: AsyncSession = Depends(async_psql.get_async_session)):
+        logger.info("Get Request Status called")
+        api_response = APIResponse()
+
+        request_obj = await session.get(RequestModel, params.request_id)
+        if not request_obj:
+            api_response.code = EAPIResponseCode.not_found
+            api_response.error_msg = f"Request {params.request_id} not found"
+            return api_response.json_response()
+        if await session.run_sync(is_ingestion_stale, request_obj):
+            # The worker ingesting the request stopped, a restart loses the background task
+            logger.info(f"Ingestion of request {params.request_id} is stale")
+            await session.run_sync(fail_ingestion, params.request_id)
+            await session.refresh(request_obj)
+        api_response.result = {
+            "status": request_obj.status,
+            **await session.run_sync(get_ingestion_progress, params.request_id),
+        }
         return api_response.json_response()
 
     @router.get("/request/copy/{project_geid}/files", tags=[_API_TAG], response_model=GETRequestFilesResponse,
             summary="List request files")
-    def list_request_files(self, project_geid: str, params: GETRequestFiles = Depends(GETRequestFiles)):
+    async def list_request_files(self, project_geid: str, params: GETRequestFiles = Depends(GETRequestFiles),
+                                 session: AsyncSession = Depends(async_psql.get_async_read_session)):
         logger.info("List request files called")
         api_response = APIResponse()
-        query_params = {
-            "request_id": params.request_id
-        }
-        if params.parent_geid:
-            query_params["parent_geid"] = params.parent_geid
-        else:
-            query_params["parent_geid"] = None
-
-        sql_query = db.session.query(EntityModel)
-        for key, value in params.query.items():
-            if key in params.partial:
-                sql_query = sql_query.filter(getattr(EntityModel, key).contains(value))
-            else:
-                query_params[key] = value
-
-        if params.order_type == "desc":
-            order_by = getattr(EntityModel, params.order_by).desc()
-        else:
-            order_by = getattr(EntityModel, params.order_by).asc()
-        sql_query = sql_query.filter_by(**query_params).order_by(EntityModel.entity_type.desc(), order_by)
+        model = EntityArchiveModel if params.archive else EntityModel
+        sql_query = get_request_files_query(
+            params.request_id, params.parent_geid, params.query, params.partial, params.partial_match, model
+        )
 
-        results = sql_query.limit(params.page_size).offset(params.page * params.page_size)
+        # id is unique and makes the sort order deterministic for cursors
+        order_desc = params.order_type == "desc"
+        sort_columns = [
+            (model.entity_type, True),
+            (getattr(model, params.order_by), order_desc),
+            (model.id, order_desc),
+        ]
+        results, next_cursor, total = await async_psql.paginate_query(
+            session, sql_query, sort_columns, params.page, params.page_size, params.cursor, params.total_mode
+        )
         routing = []
         if params.parent_geid:
-            entity_geid = params.parent_geid
-            while entity_geid:
-                file = db.session.query(EntityModel).filter_by(request_id=params.request_id, entity_geid=entity_geid).first()
-                routing.append(file.to_dict())
-                entity_geid = file.parent_geid
+            routing = await async_psql.get_routing(session, params.request_id, params.parent_geid, model)
 
-        total = db.session.query(EntityModel).filter_by(**query_params).count()
         api_response.result = {"data": [i.to_dict() for i in results], "routing": routing}
         api_response.total = total
         api_response.page = params.page
-        api_response.num_of_pages = math.ceil(total / params.page_size)
+        api_response.num_of_pages = get_num_of_pages(total, params.page_size)
+        api_response.next_cursor = next_cursor
         return api_response.json_response()
 
+    @router.get("/request/copy/{project_geid}/files/export", tags=[_API_TAG], summary="Export request files")
+    async def export_request_files(self, project_geid: str,
+                                   params: GETRequestFilesExport = Depends(GETRequestFilesExport),
+                                   session: AsyncSession = Depends(async_psql.get_async_read_session)):
+        logger.info("Export request files called")
+        model = EntityArchiveModel if params.archive else EntityModel
+        # The dependency closes the session once the response is sent, aborted or failed
+        folder_path = None
+        if params.parent_geid:
+            folder_path = await session.scalar(select(model.path).where(
+                model.request_id == params.request_id, model.entity_geid == params.parent_geid
+            ))
+            if not folder_path:
+                api_response = APIResponse()
+                api_response.code = EAPIResponseCode.not_found
+                api_response.error_msg = f"Folder {params.parent_geid} not found in request"
+                return api_response.json_response()
+        statement = get_export_query(
+            params.request_id, folder_path, params.query, params.partial, params.partial_match, model
+        ).statement
+
+        filename = f"request_{params.request_id}.{params.export_format}"
+        headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+        if params.export_format == "csv":
+            columns = model.__table__.columns.keys()
+            content = async_psql.export_csv(session, statement, columns)
+            return StreamingResponse(content, media_type="text/csv", headers=headers)
+        content = async_psql.export_ndjson(session, statement)
+        return StreamingResponse(content, media_type="application/x-ndjson", headers=headers)
+
     @router.put("/request/copy/{project_geid}/files", tags=[_API_TAG], response_model=PUTRequestFilesResponse,
             summary="Approve all files and trigger copy pipeline")
-    def review_all_files(self, project_geid: str, data: PUTRequestFiles, request: Request):
+    async def review_all_files(self, project_geid: str, data: PUTRequestFiles, request: Request,
+                               session: AsyncSession = Depends(async_psql.get_async_session)):
         logger.info("Review all files called")
         api_response = APIResponse()
+        await check_request_ingested(session, data.request_id)
         review_status = data.review_status
 
-        approved = db.session.query(EntityModel).filter_by(request_id=data.request_id, review_status="approved")
-        denied = db.session.query(EntityModel).filter_by(request_id=data.request_id, review_status="denied")
-        skipped_data = {"approved": approved.count(), "denied": denied.count()}
+        summary = await session.run_sync(get_request_summary, data.request_id)
+        skipped_data = {"approved": summary.approved_count, "denied": summary.denied_count}
 
-        entities = db.session.query(EntityModel).filter_by(request_id=data.request_id, review_status="pending")
-        file_geids = [i.entity_geid for i in entities]
-        result = update_files_sql(data.request_id, review_status, data.username, file_geids)
+        file_geids = list((await session.execute(select(EntityModel.entity_geid).where(
+            EntityModel.request_id == data.request_id, EntityModel.review_status == "pending"
+        ))).scalars())
+        result = await session.run_sync(update_files_sql, data.request_id, review_status, data.username, file_geids)
 
         if review_status == "approved":
-            top_level_entities = db.session.query(EntityModel).filter_by(request_id=data.request_id, parent_geid=None)
-            top_level_geids = [i.entity_geid for i in top_level_entities]
+            top_level_geids = list((await session.execute(select(EntityModel.entity_geid).where(
+                EntityModel.request_id == data.request_id, EntityModel.parent_geid.is_(None)
+            ))).scalars())
             if top_level_geids:
                 # Send top level file/folder geids to copy pipeline
                 logger.info(f"Triggering pipeline for {top_level_geids}")
-                request_obj: RequestModel = db.session.query(RequestModel).get(data.request_id)
-                auth = {
-                    "Authorization": request.headers.get("Authorization").replace("Bearer ", ""),
-                    "Refresh-Token": request.headers.get("Refresh-Token"),
-                }
-                copy_result = trigger_copy_pipeline(
-                    str(request_obj.id),
-                    request_obj.project_geid,
-                    request_obj.source_geid,
-                    request_obj.destination_geid,
-                    top_level_geids,
-                    data.username,
-                    data.session_id,
-                    auth,
+                copy_result = await start_copy_pipeline(
+                    session, data.request_id, top_level_geids, data.username, data.session_id, request
                 )
                 logger.info(f"Pipeline trigger for {len(copy_result)} files")
 
@@ -207,36 +368,26 @@ class APICopyRequest:
 
     @router.patch("/request/copy/{project_geid}/files", tags=[_API_TAG], response_model=PUTRequestFilesResponse,
             summary="Approve files and trigger copy pipeline")
-    def review_files(self, project_geid: str, data: PATCHRequestFiles, request: Request):
+    async def review_files(self, project_geid: str, data: PATCHRequestFiles, request: Request,
+                           session: AsyncSession = Depends(async_psql.get_async_session)):
         logger.info("Review files called")
         api_response = APIResponse()
+        await check_request_ingested(session, data.request_id)
         review_status = data.review_status
 
-        approved = get_all_sub_folder_nodes(data.request_id, data.entity_geids, "approved")
-        denied = get_all_sub_folder_nodes(data.request_id, data.entity_geids, "denied")
+        approved = await session.run_sync(get_all_sub_folder_nodes, data.request_id, data.entity_geids, "approved")
+        denied = await session.run_sync(get_all_sub_folder_nodes, data.request_id, data.entity_geids, "denied")
         skipped_data = {"approved": len(approved), "denied": len(denied)}
 
-        file_geids = get_all_sub_files(data.request_id, data.entity_geids)
-        result = update_files_sql(data.request_id, review_status, data.username, file_geids)
+        file_geids = await session.run_sync(get_all_sub_files, data.request_id, data.entity_geids)
+        result = await session.run_sync(update_files_sql, data.request_id, review_status, data.username, file_geids)
 
         if review_status == "approved":
             if data.entity_geids:
                 # Send geid's of file/folders submitted by frontend to copy pipeline
                 logger.info(f"Triggering pipeline for {data.entity_geids}")
-                request_obj: RequestModel = db.session.query(RequestModel).get(data.request_id)
-                auth = {
-                    "Authorization": request.headers.get("Authorization").replace("Bearer ", ""),
-                    "Refresh-Token": request.headers.get("Refresh-Token"),
-                }
-                copy_result = trigger_copy_pipeline(
-                    str(request_obj.id),
-                    request_obj.project_geid,
-                    request_obj.source_geid,
-                    request_obj.destination_geid,
-                    data.entity_geids,
-                    data.username,
-                    data.session_id,
-                    auth,
+                copy_result = await start_copy_pipeline(
+                    session, data.request_id, data.entity_geids, data.username, data.session_id, request
                 )
                 logger.info(f"Pipeline trigger for {len(copy_result)} files")
         skipped_data["updated"] = result
@@ -245,46 +396,41 @@ class APICopyRequest:
 
     @router.put("/request/copy/{project_geid}", tags=[_API_TAG], response_model=PUTRequestFilesResponse,
             summary="Approve files")
-    def complete_request(self, project_geid: str, data: PUTRequest):
+    async def complete_request(self, project_geid: str, data: PUTRequest,
+                               session: AsyncSession = Depends(async_psql.get_async_session)):
         logger.info("Complete request called")
         api_response = APIResponse()
-
-        request_obj = db.session.query(RequestModel).get(data.request_id)
-
-        query_params = {
-            "request_id": data.request_id,
-            "review_status": "pending",
-        }
-        pending_files = db.session.query(EntityModel).filter_by(**query_params)
-        if pending_files.count():
-            pending_entities = [i.entity_geid for i in pending_files]
-            # exclude delted files from pending list
-            pending_nodes = bulk_get_by_geids(pending_entities)
-            for entity in pending_nodes:
-                if entity["archived"]:
-                    pending_entities.remove(entity["global_entity_id"])
-            if pending_entities:
-                error_msg = f"{len(pending_entities)} pending files in request"
-                logger.info(error_msg)
-                api_response.error_msg = error_msg
-                api_response.result = {
-                    "status": "pending",
-                    "pending_entities": pending_entities,
-                    "pending_count": len(pending_entities),
-                }
-                api_response.code = EAPIResponseCode.bad_request
-                return api_response.json_response()
+        await check_request_ingested(session, data.request_id)
+
+        request_obj = await session.get(RequestModel, data.request_id)
+
+        # exclude deleted files from pending list, rows not synced recently are re-checked against neo4j
+        await async_psql.refresh_archived_state(session, data.request_id, max_age=0 if data.verify else None)
+        if (await session.run_sync(get_request_summary, data.request_id)).pending_count:
+            pending_entities = await async_psql.get_pending_geids(session, data.request_id)
+            error_msg = f"{len(pending_entities)} pending files in request"
+            logger.info(error_msg)
+            api_response.error_msg = error_msg
+            api_response.result = {
+                "status": "pending",
+                "pending_entities": pending_entities,
+                "pending_count": len(pending_entities),
+            }
+            api_response.code = EAPIResponseCode.bad_request
+            return api_response.json_response()
 
         request_obj.status = data.status
         request_obj.review_notes = data.review_notes
         request_obj.completed_by = data.username
         request_obj.completed_at = datetime.utcnow()
-        db.session.commit()
-        db.session.refresh(request_obj)
+        await session.commit()
+        await session.refresh(request_obj)
 
         submitted_at = request_obj.submitted_at.strftime("%Y-%m-%d %H:%M:%S")
         completed_at = request_obj.completed_at.strftime("%Y-%m-%d %H:%M:%S")
-        notify_user(request_obj.submitted_by, data.username, project_geid, submitted_at, completed_at)
+        await asyncio.to_thread(
+            notify_user, request_obj.submitted_by, data.username, project_geid, submitted_at, completed_at
+        )
         api_response.result = {
             "status": data.status,
             "pending_entities": [],
@@ -294,42 +440,37 @@ class APICopyRequest:
 
     @router.get("/request/copy/{project_geid}/pending-files", tags=[_API_TAG], response_model=GETPendingResponse,
             summary="Get pending count")
-    def get_pending(self, project_geid: str, params: GETRequestPending = Depends(GETRequestPending)):
+    async def get_pending(self, project_geid: str, params: GETRequestPending = Depends(GETRequestPending),
+                          session: AsyncSession = Depends(async_psql.get_async_read_session)):
         logger.info("Get Pending called")
         api_response = APIResponse()
 
-        request_obj = db.session.query(RequestModel).get(params.request_id)
-
-        query_params = {
-            "request_id": params.request_id,
-            "review_status": "pending",
-        }
-        pending_files = db.session.query(EntityModel).filter_by(**query_params)
-        logger.info(f"{pending_files.count()} pending files in request")
-        pending_entities = [i.entity_geid for i in pending_files]
-        if pending_entities:
-            # exclude deleted files from pending list
-            pending_nodes = bulk_get_by_geids(pending_entities)
-            for entity in pending_nodes:
-                if entity["archived"]:
-                    pending_entities.remove(entity["global_entity_id"])
+        if params.verify:
+            # re-check the archived state of every pending file against neo4j on the primary, then read it back
+            session = async_psql.get_async_sessionmaker()()
+        async with session:
+            if params.verify:
+                await async_psql.refresh_archived_state(session, params.request_id, 0)
+            pending_count = await async_psql.get_pending_count(session, params.request_id)
+            logger.info(f"{pending_count} pending files in request")
+            pending_geids = await async_psql.get_pending_geids(session, params.request_id) if pending_count else []
         api_response.result = {
-            "pending_entities": pending_entities,
-            "pending_count": len(pending_entities),
+            "pending_entities": pending_geids,
+            "pending_count": pending_count,
         }
         return api_response.json_response()
 
     @router.delete("/request/copy/{project_geid}/delete/{request_id}", tags=[_API_TAG], summary="Delete Request")
-    def delete_request(self, project_geid: str, request_id: str):
+    async def delete_request(self, project_geid: str, request_id: str, background_tasks: BackgroundTasks,
+                             session: AsyncSession = Depends(async_psql.get_async_session)):
         api_response = APIResponse()
-        request_files = db.session.query(EntityModel).filter_by(request_id=request_id)
-        for request_file in request_files:
-            db.session.delete(request_file)
-        db.session.commit()
-
-        request_obj = db.session.query(RequestModel).get(request_id)
-        db.session.delete(request_obj)
-        db.session.commit()
+        # Failed requests are only deleted, an ingesting one is deleted once its ingestion ends
+        await check_request_ingested(session, request_id, allow_failed=True)
+        if await session.run_sync(get_entity_count, request_id) > ConfigClass.ENTITY_PURGE_THRESHOLD:
+            logger.info(f"Purging request {request_id} in background")
+            await session.run_sync(soft_delete_request, request_id)
+            background_tasks.add_task(async_psql.purge_request, request_id)
+        else:
+            await session.run_sync(delete_request_sql, request_id)
         api_response.result = "success"
         return api_response.json_response()
-
@@ -18,10 +18,10 @@
 # permissions and limitations under the Licence.
 # 
 
+from app.commons.http_services import get_http_client
 from app.commons.notifier_service.email_service import SrvEmail
 from app.commons.neo4j_services import query_node
 from app.config import ConfigClass
-import requests
 
 
 def get_user(username: str) -> dict:
@@ -29,7 +29,7 @@ def get_user(username: str) -> dict:
         "username": username,
         "exact": True,
     }
-    response = requests.get(ConfigClass.AUTH_SERVICE + "admin/user", params=query)
+    response = get_http_client().get(ConfigClass.AUTH_SERVICE + "admin/user", params=query)
     if response.status_code != 200:
         raise Exception(f"Error getting user {username} from auth service: " + str(response.json()))
     return response.json()["result"]
@@ -44,7 +44,7 @@ def notify_project_admins(username: str, project_geid: str, request_timestamp: s
         "role_names": [f"{project_code}-admin"],
         "status": "active",
     }
-    response = requests.post(ConfigClass.AUTH_SERVICE + "admin/roles/users", json=payload)
+    response = get_http_client().post(ConfigClass.AUTH_SERVICE + "admin/roles/users", json=payload, retry=True)
     project_admins = response.json()["result"]
 
     for project_admin in project_admins:
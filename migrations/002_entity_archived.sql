@@ -0,0 +1,27 @@
+// Copyright 2022 Indoc Research
+// 
+// Licensed under the EUPL, Version 1.2 or – as soon they
+// will be approved by the European Commission - subsequent
+// versions of the EUPL (the "Licence");
+// You may not use this work except in compliance with the
+// Licence.
+// You may obtain a copy of the Licence at:
+// 
+// https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+// 
+// Unless required by applicable law or agreed to in
+// writing, software distributed under the Licence is
+// distributed on an "AS IS" basis,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+// express or implied.
+// See the Licence for the specific language governing
+// permissions and limitations under the Licence.
+// 
+
+-- Archived state of the entity in neo4j, refreshed in bulk by psql_services.refresh_archived_state.
+-- archived_synced_at is left NULL for existing rows so they are synced on first use.
+ALTER TABLE indoc_vre.approval_entity ADD COLUMN archived BOOLEAN NOT NULL DEFAULT FALSE;
+ALTER TABLE indoc_vre.approval_entity ADD COLUMN archived_synced_at TIMESTAMP WITHOUT TIME ZONE;
+
+CREATE INDEX approval_entity_pending_idx ON indoc_vre.approval_entity (request_id)
+	WHERE review_status = 'pending' AND NOT archived;
@@ -0,0 +1,38 @@
+// Copyright 2022 Indoc Research
+// 
+// Licensed under the EUPL, Version 1.2 or – as soon they
+// will be approved by the European Commission - subsequent
+// versions of the EUPL (the "Licence");
+// You may not use this work except in compliance with the
+// Licence.
+// You may obtain a copy of the Licence at:
+// 
+// https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+// 
+// Unless required by applicable law or agreed to in
+// writing, software distributed under the Licence is
+// distributed on an "AS IS" basis,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+// express or implied.
+// See the Licence for the specific language governing
+// permissions and limitations under the Licence.
+// 
+
+-- Materialized ancestry path of every entity: /<top level geid>/.../<entity geid>/
+ALTER TABLE indoc_vre.approval_entity ADD COLUMN path VARCHAR;
+
+WITH RECURSIVE tree AS (
+	SELECT id, request_id, entity_geid, '/' || entity_geid || '/' AS path
+	FROM indoc_vre.approval_entity
+	WHERE parent_geid IS NULL OR parent_geid = ''
+	UNION ALL
+	SELECT entity.id, entity.request_id, entity.entity_geid, tree.path || entity.entity_geid || '/'
+	FROM indoc_vre.approval_entity entity
+	JOIN tree ON entity.request_id = tree.request_id AND entity.parent_geid = tree.entity_geid
+)
+UPDATE indoc_vre.approval_entity entity SET path = tree.path FROM tree WHERE entity.id = tree.id;
+
+-- Entities whose parent is not part of the request are treated as top level
+UPDATE indoc_vre.approval_entity SET path = '/' || entity_geid || '/' WHERE path IS NULL;
+
+CREATE INDEX approval_entity_path_idx ON indoc_vre.approval_entity (request_id, path varchar_pattern_ops);
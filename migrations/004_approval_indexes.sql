@@ -0,0 +1,33 @@
+// Copyright 2022 Indoc Research
+// 
+// Licensed under the EUPL, Version 1.2 or – as soon they
+// will be approved by the European Commission - subsequent
+// versions of the EUPL (the "Licence");
+// You may not use this work except in compliance with the
+// Licence.
+// You may obtain a copy of the Licence at:
+// 
+// https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+// 
+// Unless required by applicable law or agreed to in
+// writing, software distributed under the Licence is
+// distributed on an "AS IS" basis,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+// express or implied.
+// See the Licence for the specific language governing
+// permissions and limitations under the Licence.
+// 
+
+-- Composite indexes matching the endpoint queries, built concurrently so the
+-- tables stay writable. Run outside of a transaction block.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS approval_entity_request_parent_idx
+	ON indoc_vre.approval_entity (request_id, parent_geid);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS approval_entity_request_status_idx
+	ON indoc_vre.approval_entity (request_id, review_status);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS approval_entity_request_geid_idx
+	ON indoc_vre.approval_entity (request_id, entity_geid);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS approval_request_project_status_idx
+	ON indoc_vre.approval_request (project_geid, status, submitted_at);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS approval_request_project_status_user_idx
+	ON indoc_vre.approval_request (project_geid, status, submitted_by, submitted_at);
@@ -0,0 +1,50 @@
+// Copyright 2022 Indoc Research
+// 
+// Licensed under the EUPL, Version 1.2 or – as soon they
+// will be approved by the European Commission - subsequent
+// versions of the EUPL (the "Licence");
+// You may not use this work except in compliance with the
+// Licence.
+// You may obtain a copy of the Licence at:
+// 
+// https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+// 
+// Unless required by applicable law or agreed to in
+// writing, software distributed under the Licence is
+// distributed on an "AS IS" basis,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+// express or implied.
+// See the Licence for the specific language governing
+// permissions and limitations under the Licence.
+// 
+
+-- Per request counters, maintained in the same transaction as entity ingestion and review updates.
+-- pending_count excludes files archived in neo4j, those are counted in archived_count.
+CREATE TABLE indoc_vre.approval_request_summary (
+	request_id UUID NOT NULL, 
+	pending_count BIGINT DEFAULT 0 NOT NULL, 
+	archived_count BIGINT DEFAULT 0 NOT NULL, 
+	approved_count BIGINT DEFAULT 0 NOT NULL, 
+	denied_count BIGINT DEFAULT 0 NOT NULL, 
+	total_size BIGINT DEFAULT 0 NOT NULL, 
+	approved_size BIGINT DEFAULT 0 NOT NULL, 
+	folder_count BIGINT DEFAULT 0 NOT NULL, 
+	PRIMARY KEY (request_id), 
+	FOREIGN KEY(request_id) REFERENCES indoc_vre.approval_request (id) ON DELETE CASCADE
+);
+
+INSERT INTO indoc_vre.approval_request_summary (
+	request_id, pending_count, archived_count, approved_count, denied_count, total_size, approved_size, folder_count
+)
+SELECT
+	request.id,
+	count(entity.id) FILTER (WHERE entity.entity_type = 'file' AND entity.review_status = 'pending' AND NOT entity.archived),
+	count(entity.id) FILTER (WHERE entity.entity_type = 'file' AND entity.review_status = 'pending' AND entity.archived),
+	count(entity.id) FILTER (WHERE entity.entity_type = 'file' AND entity.review_status = 'approved'),
+	count(entity.id) FILTER (WHERE entity.entity_type = 'file' AND entity.review_status = 'denied'),
+	coalesce(sum(entity.file_size) FILTER (WHERE entity.entity_type = 'file'), 0),
+	coalesce(sum(entity.file_size) FILTER (WHERE entity.entity_type = 'file' AND entity.review_status = 'approved'), 0),
+	count(entity.id) FILTER (WHERE entity.entity_type = 'folder')
+FROM indoc_vre.approval_request request
+LEFT JOIN indoc_vre.approval_entity entity ON entity.request_id = request.id
+GROUP BY request.id;
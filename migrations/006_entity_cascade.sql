@@ -0,0 +1,24 @@
+// Copyright 2022 Indoc Research
+// 
+// Licensed under the EUPL, Version 1.2 or – as soon they
+// will be approved by the European Commission - subsequent
+// versions of the EUPL (the "Licence");
+// You may not use this work except in compliance with the
+// Licence.
+// You may obtain a copy of the Licence at:
+// 
+// https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+// 
+// Unless required by applicable law or agreed to in
+// writing, software distributed under the Licence is
+// distributed on an "AS IS" basis,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+// express or implied.
+// See the Licence for the specific language governing
+// permissions and limitations under the Licence.
+// 
+
+-- Entities are removed with their request, deleting a request is a single statement.
+ALTER TABLE indoc_vre.approval_entity DROP CONSTRAINT IF EXISTS approval_entity_request_id_fkey;
+ALTER TABLE indoc_vre.approval_entity ADD CONSTRAINT approval_entity_request_id_fkey
+	FOREIGN KEY (request_id) REFERENCES indoc_vre.approval_request (id) ON DELETE CASCADE;
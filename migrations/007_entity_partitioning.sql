@@ -0,0 +1,78 @@
+// Copyright 2022 Indoc Research
+// 
+// Licensed under the EUPL, Version 1.2 or – as soon they
+// will be approved by the European Commission - subsequent
+// versions of the EUPL (the "Licence");
+// You may not use this work except in compliance with the
+// Licence.
+// You may obtain a copy of the Licence at:
+// 
+// https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+// 
+// Unless required by applicable law or agreed to in
+// writing, software distributed under the Licence is
+// distributed on an "AS IS" basis,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+// express or implied.
+// See the Licence for the specific language governing
+// permissions and limitations under the Licence.
+// 
+
+-- Optional, only for deployments setting RDS_ENTITY_PARTITIONS, needs postgres 11 or later.
+-- Moves approval_entity to a table hash partitioned on request_id in as many partitions as RDS_ENTITY_PARTITIONS,
+-- the count is given to psql and the file fails before any change without it:
+--   psql -v partitions=$RDS_ENTITY_PARTITIONS -f 007_entity_partitioning.sql
+-- The service must be stopped while it runs, the old table is kept until the copy is verified.
+\set ON_ERROR_STOP on
+\if :{?partitions}
+	SELECT :'partitions'::int AS partitions_count \gset
+\else
+	\set partitions_count 0
+\endif
+SELECT :partitions_count > 0 AS partitions_valid \gset
+\if :partitions_valid
+\else
+	DO $$ BEGIN RAISE EXCEPTION 'run with psql -v partitions=<RDS_ENTITY_PARTITIONS>, a positive count'; END $$;
+\endif
+
+BEGIN;
+
+ALTER TABLE indoc_vre.approval_entity RENAME TO approval_entity_unpartitioned;
+ALTER TABLE indoc_vre.approval_entity_unpartitioned RENAME CONSTRAINT approval_entity_pkey TO approval_entity_unpartitioned_pkey;
+ALTER INDEX indoc_vre.approval_entity_request_parent_idx RENAME TO approval_entity_unpartitioned_request_parent_idx;
+ALTER INDEX indoc_vre.approval_entity_request_status_idx RENAME TO approval_entity_unpartitioned_request_status_idx;
+ALTER INDEX indoc_vre.approval_entity_request_geid_idx RENAME TO approval_entity_unpartitioned_request_geid_idx;
+ALTER INDEX indoc_vre.approval_entity_pending_idx RENAME TO approval_entity_unpartitioned_pending_idx;
+ALTER INDEX indoc_vre.approval_entity_path_idx RENAME TO approval_entity_unpartitioned_path_idx;
+
+CREATE TABLE indoc_vre.approval_entity (
+	LIKE indoc_vre.approval_entity_unpartitioned INCLUDING DEFAULTS,
+	PRIMARY KEY (id, request_id),
+	FOREIGN KEY (request_id) REFERENCES indoc_vre.approval_request (id) ON DELETE CASCADE
+) PARTITION BY HASH (request_id);
+
+-- One CREATE TABLE per partition, approval_entity_p0 to approval_entity_p<n-1> as the model creates them
+SELECT format(
+	'CREATE TABLE indoc_vre.approval_entity_p%s PARTITION OF indoc_vre.approval_entity '
+	'FOR VALUES WITH (MODULUS %s, REMAINDER %s)',
+	remainder, :partitions_count, remainder
+)
+FROM generate_series(0, :partitions_count - 1) AS remainder
+\gexec
+
+INSERT INTO indoc_vre.approval_entity SELECT * FROM indoc_vre.approval_entity_unpartitioned;
+
+-- Indexes are built after the copy, each one is created on every partition
+CREATE INDEX approval_entity_request_parent_idx ON indoc_vre.approval_entity (request_id, parent_geid);
+CREATE INDEX approval_entity_request_status_idx ON indoc_vre.approval_entity (request_id, review_status);
+CREATE INDEX approval_entity_request_geid_idx ON indoc_vre.approval_entity (request_id, entity_geid);
+CREATE INDEX approval_entity_pending_idx ON indoc_vre.approval_entity (request_id)
+	WHERE review_status = 'pending' AND NOT archived;
+CREATE INDEX approval_entity_path_idx ON indoc_vre.approval_entity (request_id, path varchar_pattern_ops);
+
+COMMIT;
+
+ANALYZE indoc_vre.approval_entity;
+
+-- Once verified:
+-- DROP TABLE indoc_vre.approval_entity_unpartitioned;
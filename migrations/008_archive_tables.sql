@@ -0,0 +1,40 @@
+// Copyright 2022 Indoc Research
+// 
+// Licensed under the EUPL, Version 1.2 or – as soon they
+// will be approved by the European Commission - subsequent
+// versions of the EUPL (the "Licence");
+// You may not use this work except in compliance with the
+// Licence.
+// You may obtain a copy of the Licence at:
+// 
+// https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+// 
+// Unless required by applicable law or agreed to in
+// writing, software distributed under the Licence is
+// distributed on an "AS IS" basis,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+// express or implied.
+// See the Licence for the specific language governing
+// permissions and limitations under the Licence.
+// 
+
+-- Cold storage for completed requests, filled by python -m app.commons.psql_services.archive.
+-- Same columns as the hot tables with only the indexes used by the archive listings.
+CREATE TABLE indoc_vre.approval_request_archive (
+	LIKE indoc_vre.approval_request INCLUDING DEFAULTS,
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX approval_request_archive_project_status_idx
+	ON indoc_vre.approval_request_archive (project_geid, status, submitted_at);
+
+CREATE TABLE indoc_vre.approval_entity_archive (
+	LIKE indoc_vre.approval_entity INCLUDING DEFAULTS,
+	PRIMARY KEY (id),
+	FOREIGN KEY (request_id) REFERENCES indoc_vre.approval_request_archive (id) ON DELETE CASCADE
+);
+
+CREATE INDEX approval_entity_archive_request_parent_idx
+	ON indoc_vre.approval_entity_archive (request_id, parent_geid);
+CREATE INDEX approval_entity_archive_request_geid_idx
+	ON indoc_vre.approval_entity_archive (request_id, entity_geid);
@@ -0,0 +1,71 @@
+// Copyright 2022 Indoc Research
+// 
+// Licensed under the EUPL, Version 1.2 or – as soon they
+// will be approved by the European Commission - subsequent
+// versions of the EUPL (the "Licence");
+// You may not use this work except in compliance with the
+// Licence.
+// You may obtain a copy of the Licence at:
+// 
+// https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+// 
+// Unless required by applicable law or agreed to in
+// writing, software distributed under the Licence is
+// distributed on an "AS IS" basis,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+// express or implied.
+// See the Licence for the specific language governing
+// permissions and limitations under the Licence.
+// 
+
+-- Trigram indexes of the partial matches of list_request_files (contains, prefix, case insensitive).
+-- CONCURRENTLY can't run inside a transaction block, run this file with psql in autocommit:
+--   psql -f 009_entity_trigram.sql
+-- The branch follows the layout of approval_entity:
+-- - plain table: each index is built CONCURRENTLY on the table.
+-- - partitioned by migration 007, postgres 11 or later: a partitioned parent can't be indexed CONCURRENTLY.
+--   Each index is created ON ONLY the parent, invalid and empty, then built CONCURRENTLY on every partition
+--   and attached to it. The parent index turns valid once every partition is attached.
+\set ON_ERROR_STOP on
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+SELECT relkind = 'p' AS entity_partitioned FROM pg_class WHERE oid = 'indoc_vre.approval_entity'::regclass \gset
+
+\if :entity_partitioned
+CREATE INDEX IF NOT EXISTS approval_entity_name_trgm_idx
+	ON ONLY indoc_vre.approval_entity USING gin (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS approval_entity_uploaded_by_trgm_idx
+	ON ONLY indoc_vre.approval_entity USING gin (uploaded_by gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS approval_entity_dcm_id_trgm_idx
+	ON ONLY indoc_vre.approval_entity USING gin (dcm_id gin_trgm_ops);
+
+-- approval_entity_p<n>_<column>_trgm_idx on every partition, \gexec runs each statement on its own
+SELECT format(
+	'CREATE INDEX CONCURRENTLY IF NOT EXISTS %I ON indoc_vre.%I USING gin (%I gin_trgm_ops)',
+	partition.relname || '_' || column_name || '_trgm_idx', partition.relname, column_name
+)
+FROM pg_inherits
+JOIN pg_class partition ON partition.oid = pg_inherits.inhrelid
+CROSS JOIN unnest(ARRAY['name', 'uploaded_by', 'dcm_id']) AS column_name
+WHERE pg_inherits.inhparent = 'indoc_vre.approval_entity'::regclass
+ORDER BY partition.relname, column_name
+\gexec
+
+SELECT format(
+	'ALTER INDEX indoc_vre.%I ATTACH PARTITION indoc_vre.%I',
+	'approval_entity_' || column_name || '_trgm_idx', partition.relname || '_' || column_name || '_trgm_idx'
+)
+FROM pg_inherits
+JOIN pg_class partition ON partition.oid = pg_inherits.inhrelid
+CROSS JOIN unnest(ARRAY['name', 'uploaded_by', 'dcm_id']) AS column_name
+WHERE pg_inherits.inhparent = 'indoc_vre.approval_entity'::regclass
+ORDER BY partition.relname, column_name
+\gexec
+\else
+CREATE INDEX CONCURRENTLY IF NOT EXISTS approval_entity_name_trgm_idx
+	ON indoc_vre.approval_entity USING gin (name gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS approval_entity_uploaded_by_trgm_idx
+	ON indoc_vre.approval_entity USING gin (uploaded_by gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS approval_entity_dcm_id_trgm_idx
+	ON indoc_vre.approval_entity USING gin (dcm_id gin_trgm_ops);
+\endif
@@ -0,0 +1,94 @@
+// Copyright 2022 Indoc Research
+// 
+// Licensed under the EUPL, Version 1.2 or – as soon they
+// will be approved by the European Commission - subsequent
+// versions of the EUPL (the "Licence");
+// You may not use this work except in compliance with the
+// Licence.
+// You may obtain a copy of the Licence at:
+// 
+// https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+// 
+// Unless required by applicable law or agreed to in
+// writing, software distributed under the Licence is
+// distributed on an "AS IS" basis,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+// express or implied.
+// See the Licence for the specific language governing
+// permissions and limitations under the Licence.
+// 
+
+-- Recursive rollups of the files under each folder, maintained by ingestion and review updates.
+-- Files keep NULL, folders are backfilled from the paths of the files under them.
+-- pending_count leaves archived files out, as pending_count of approval_request_summary.
+ALTER TABLE indoc_vre.approval_entity
+	ADD COLUMN file_count BIGINT,
+	ADD COLUMN total_size BIGINT,
+	ADD COLUMN pending_count BIGINT,
+	ADD COLUMN approved_count BIGINT,
+	ADD COLUMN denied_count BIGINT;
+
+ALTER TABLE indoc_vre.approval_entity_archive
+	ADD COLUMN file_count BIGINT,
+	ADD COLUMN total_size BIGINT,
+	ADD COLUMN pending_count BIGINT,
+	ADD COLUMN approved_count BIGINT,
+	ADD COLUMN denied_count BIGINT;
+
+UPDATE indoc_vre.approval_entity
+SET file_count = 0, total_size = 0, pending_count = 0, approved_count = 0, denied_count = 0
+WHERE entity_type = 'folder';
+
+UPDATE indoc_vre.approval_entity folder
+SET
+	file_count = rollup.file_count,
+	total_size = rollup.total_size,
+	pending_count = rollup.pending_count,
+	approved_count = rollup.approved_count,
+	denied_count = rollup.denied_count
+FROM (
+	SELECT
+		entity.request_id,
+		ancestor.geid,
+		count(*) AS file_count,
+		coalesce(sum(entity.file_size), 0) AS total_size,
+		count(*) FILTER (WHERE entity.review_status = 'pending' AND NOT entity.archived) AS pending_count,
+		count(*) FILTER (WHERE entity.review_status = 'approved') AS approved_count,
+		count(*) FILTER (WHERE entity.review_status = 'denied') AS denied_count
+	FROM indoc_vre.approval_entity entity
+	CROSS JOIN LATERAL unnest(string_to_array(trim(both '/' from entity.path), '/')) AS ancestor(geid)
+	WHERE entity.entity_type = 'file' AND ancestor.geid <> entity.entity_geid
+	GROUP BY entity.request_id, ancestor.geid
+) rollup
+WHERE folder.request_id = rollup.request_id
+	AND folder.entity_geid = rollup.geid
+	AND folder.entity_type = 'folder';
+
+UPDATE indoc_vre.approval_entity_archive
+SET file_count = 0, total_size = 0, pending_count = 0, approved_count = 0, denied_count = 0
+WHERE entity_type = 'folder';
+
+UPDATE indoc_vre.approval_entity_archive folder
+SET
+	file_count = rollup.file_count,
+	total_size = rollup.total_size,
+	pending_count = rollup.pending_count,
+	approved_count = rollup.approved_count,
+	denied_count = rollup.denied_count
+FROM (
+	SELECT
+		entity.request_id,
+		ancestor.geid,
+		count(*) AS file_count,
+		coalesce(sum(entity.file_size), 0) AS total_size,
+		count(*) FILTER (WHERE entity.review_status = 'pending' AND NOT entity.archived) AS pending_count,
+		count(*) FILTER (WHERE entity.review_status = 'approved') AS approved_count,
+		count(*) FILTER (WHERE entity.review_status = 'denied') AS denied_count
+	FROM indoc_vre.approval_entity_archive entity
+	CROSS JOIN LATERAL unnest(string_to_array(trim(both '/' from entity.path), '/')) AS ancestor(geid)
+	WHERE entity.entity_type = 'file' AND ancestor.geid <> entity.entity_geid
+	GROUP BY entity.request_id, ancestor.geid
+) rollup
+WHERE folder.request_id = rollup.request_id
+	AND folder.entity_geid = rollup.geid
+	AND folder.entity_type = 'folder';
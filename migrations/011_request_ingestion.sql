@@ -0,0 +1,28 @@
+// Copyright 2022 Indoc Research
+// 
+// Licensed under the EUPL, Version 1.2 or – as soon they
+// will be approved by the European Commission - subsequent
+// versions of the EUPL (the "Licence");
+// You may not use this work except in compliance with the
+// Licence.
+// You may obtain a copy of the Licence at:
+// 
+// https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+// 
+// Unless required by applicable law or agreed to in
+// writing, software distributed under the Licence is
+// distributed on an "AS IS" basis,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+// express or implied.
+// See the Licence for the specific language governing
+// permissions and limitations under the Licence.
+// 
+
+-- Entities found in neo4j when a request is created, the ingestion progress of asynchronous requests
+-- is discovered_count against the entities counted in the other columns, heartbeat_at is its last progress.
+ALTER TABLE indoc_vre.approval_request_summary
+	ADD COLUMN discovered_count BIGINT DEFAULT 0 NOT NULL,
+	ADD COLUMN heartbeat_at TIMESTAMP WITHOUT TIME ZONE;
+
+UPDATE indoc_vre.approval_request_summary
+SET discovered_count = pending_count + archived_count + approved_count + denied_count + folder_count;
@@ -0,0 +1,65 @@
+// Copyright 2022 Indoc Research
+// 
+// Licensed under the EUPL, Version 1.2 or – as soon they
+// will be approved by the European Commission - subsequent
+// versions of the EUPL (the "Licence");
+// You may not use this work except in compliance with the
+// Licence.
+// You may obtain a copy of the Licence at:
+// 
+// https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+// 
+// Unless required by applicable law or agreed to in
+// writing, software distributed under the Licence is
+// distributed on an "AS IS" basis,
+// WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+// express or implied.
+// See the Licence for the specific language governing
+// permissions and limitations under the Licence.
+// 
+
+-- Index of the folder listing of list_request_files, in the order of its default sort on uploaded_at so
+-- a cursor page is a range of the index. Built CONCURRENTLY, run this file with psql in autocommit:
+--   psql -f 012_entity_listing_index.sql
+-- On a table partitioned by migration 007 the index is created ON ONLY the parent, built CONCURRENTLY
+-- on every partition and attached, as in migration 009.
+-- The (request_id, parent_geid) indexes are a prefix of the new ones and are dropped once they are built,
+-- a partitioned index can't be dropped CONCURRENTLY.
+\set ON_ERROR_STOP on
+SELECT relkind = 'p' AS entity_partitioned FROM pg_class WHERE oid = 'indoc_vre.approval_entity'::regclass \gset
+
+\if :entity_partitioned
+CREATE INDEX IF NOT EXISTS approval_entity_listing_idx
+	ON ONLY indoc_vre.approval_entity (request_id, parent_geid, entity_type, uploaded_at, id);
+
+SELECT format(
+	'CREATE INDEX CONCURRENTLY IF NOT EXISTS %I ON indoc_vre.%I (request_id, parent_geid, entity_type, uploaded_at, id)',
+	partition.relname || '_listing_idx', partition.relname
+)
+FROM pg_inherits
+JOIN pg_class partition ON partition.oid = pg_inherits.inhrelid
+WHERE pg_inherits.inhparent = 'indoc_vre.approval_entity'::regclass
+ORDER BY partition.relname
+\gexec
+
+SELECT format(
+	'ALTER INDEX indoc_vre.approval_entity_listing_idx ATTACH PARTITION indoc_vre.%I',
+	partition.relname || '_listing_idx'
+)
+FROM pg_inherits
+JOIN pg_class partition ON partition.oid = pg_inherits.inhrelid
+WHERE pg_inherits.inhparent = 'indoc_vre.approval_entity'::regclass
+ORDER BY partition.relname
+\gexec
+
+DROP INDEX IF EXISTS indoc_vre.approval_entity_request_parent_idx;
+\else
+CREATE INDEX CONCURRENTLY IF NOT EXISTS approval_entity_listing_idx
+	ON indoc_vre.approval_entity (request_id, parent_geid, entity_type, uploaded_at, id);
+
+DROP INDEX CONCURRENTLY IF EXISTS indoc_vre.approval_entity_request_parent_idx;
+\endif
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS approval_entity_archive_listing_idx
+	ON indoc_vre.approval_entity_archive (request_id, parent_geid, entity_type, uploaded_at, id);
+DROP INDEX CONCURRENTLY IF EXISTS indoc_vre.approval_entity_archive_request_parent_idx;
@@ -0,0 +1,63 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+from datetime import datetime, timedelta
+
+from fastapi_sqlalchemy import db
+
+from app.commons.psql_services import bulk_create_entities
+from app.commons.psql_services.archive import archive_completed_requests
+from app.models.copy_request_sql import EntityModel, RequestModel
+from tests.conftest import FILE_DATA, FOLDER_DATA
+
+PROJECT_GEID = "archive_project"
+
+
+def test_archive_completed_requests(test_client):
+    with db(commit_on_exit=True):
+        completed_at = datetime.utcnow() - timedelta(days=100)
+        request_obj = RequestModel(
+            status="complete", project_geid=PROJECT_GEID, submitted_by="admin", completed_at=completed_at
+        )
+        db.session.add(request_obj)
+        db.session.flush()
+        folder = {**FOLDER_DATA, "global_entity_id": "archive_folder", "parent_folder_geid": None}
+        file_data = {**FILE_DATA, "global_entity_id": "archive_file", "parent_folder_geid": "archive_folder"}
+        bulk_create_entities(db.session, request_obj.id, [folder, file_data])
+        request_id = request_obj.id
+
+    with db():
+        assert archive_completed_requests(max_age_days=30) == 1
+        assert db.session.query(RequestModel).filter_by(id=request_id).count() == 0
+        assert db.session.query(EntityModel).filter_by(request_id=request_id).count() == 0
+
+    payload = {"status": "complete"}
+    response = test_client.get(f"/v1/request/copy/{PROJECT_GEID}", params=payload)
+    assert response.json()["result"] == []
+
+    payload["archive"] = True
+    response = test_client.get(f"/v1/request/copy/{PROJECT_GEID}", params=payload)
+    assert response.json()["result"][0]["id"] == str(request_id)
+
+    payload = {"request_id": str(request_id), "parent_geid": "archive_folder", "archive": True}
+    response = test_client.get(f"/v1/request/copy/{PROJECT_GEID}/files", params=payload)
+    assert response.status_code == 200
+    assert response.json()["result"]["data"][0]["entity_geid"] == "archive_file"
+    assert response.json()["result"]["routing"][0]["entity_geid"] == "archive_folder"
@@ -0,0 +1,39 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+import pytest
+
+from app.commons.psql_services import async_psql
+from app.config import ConfigClass
+
+
+@pytest.mark.parametrize("uri", [
+    "postgresql://user:pass@db:5432/approval",
+    "postgresql+psycopg2://user:pass@db:5432/approval",
+])
+def test_async_db_uri_uses_asyncpg(monkeypatch, uri):
+    monkeypatch.setattr(ConfigClass, "RDS_DB_URI", uri)
+    monkeypatch.setattr(ConfigClass, "RDS_ASYNC_DB_URI", "")
+    assert async_psql.get_async_db_uri() == "postgresql+asyncpg://user:pass@db:5432/approval"
+
+
+def test_async_db_uri_override(monkeypatch):
+    monkeypatch.setattr(ConfigClass, "RDS_ASYNC_DB_URI", "postgresql+asyncpg://replica/approval")
+    assert async_psql.get_async_db_uri() == "postgresql+asyncpg://replica/approval"
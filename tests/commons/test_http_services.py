@@ -0,0 +1,50 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+from app.commons.http_services import HTTPClient
+
+URL = "http://downstream/v1/test"
+
+
+def get_client():
+    return HTTPClient(
+        connect_timeout=1, read_timeout=1, pool_connections=1, pool_maxsize=1, max_retries=2, retry_backoff=0
+    )
+
+
+def test_get_retried_on_unavailable(requests_mocker):
+    mocker = requests_mocker.get(URL, [{"status_code": 503}, {"status_code": 200, "json": {"result": "ok"}}])
+    response = get_client().get(URL)
+    assert response.status_code == 200
+    assert mocker.call_count == 2
+
+
+def test_post_not_retried_by_default(requests_mocker):
+    mocker = requests_mocker.post(URL, [{"status_code": 503}, {"status_code": 200}])
+    response = get_client().post(URL, json={})
+    assert response.status_code == 503
+    assert mocker.call_count == 1
+
+
+def test_retries_are_bounded(requests_mocker):
+    mocker = requests_mocker.post(URL, status_code=503)
+    response = get_client().post(URL, json={}, retry=True)
+    assert response.status_code == 503
+    assert mocker.call_count == 3
@@ -0,0 +1,70 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+from fastapi_sqlalchemy import db
+from sqlalchemy.orm import Session
+
+from app.commons.psql_services import add_discovered_entities, bulk_create_entities, get_entity_count
+from app.models.copy_request_sql import RequestModel, RequestSummaryModel
+from tests.conftest import FILE_DATA, FOLDER_DATA
+
+
+def create_ingesting_request() -> str:
+    with db(commit_on_exit=True):
+        request_obj = RequestModel(status="ingesting", project_geid="ingestion_project", submitted_by="admin")
+        db.session.add(request_obj)
+        db.session.flush()
+        return request_obj.id
+
+
+def fail_request(request_id: str):
+    # Status poll of another worker, in a transaction of its own
+    with Session(db.session.get_bind()) as session:
+        session.query(RequestModel).filter_by(id=request_id).update({"status": "failed"})
+        session.commit()
+
+
+def test_batches_stop_when_request_leaves_ingesting(test_client):
+    request_id = create_ingesting_request()
+
+    def get_entities():
+        yield {**FOLDER_DATA, "global_entity_id": "ingestion_folder", "parent_folder_geid": None}
+        yield {**FILE_DATA, "global_entity_id": "ingestion_file_1", "parent_folder_geid": "ingestion_folder"}
+        # The first batch is committed, the request fails before the second one
+        fail_request(request_id)
+        yield {**FILE_DATA, "global_entity_id": "ingestion_file_2", "parent_folder_geid": "ingestion_folder"}
+
+    with db():
+        assert bulk_create_entities(db.session, request_id, get_entities(), batch_size=2, commit=True) == 2
+        assert get_entity_count(db.session, request_id) == 2
+
+
+def test_discovered_entities_committed_while_ingesting(test_client):
+    request_id = create_ingesting_request()
+    with db():
+        assert add_discovered_entities(db.session, request_id, 3)
+        assert add_discovered_entities(db.session, request_id, 2)
+        summary = db.session.query(RequestSummaryModel).filter_by(request_id=request_id).one()
+        assert summary.discovered_count == 5
+        assert summary.heartbeat_at is not None
+
+        fail_request(request_id)
+        assert not add_discovered_entities(db.session, request_id, 1)
+        db.session.refresh(summary)
+        assert summary.discovered_count == 5
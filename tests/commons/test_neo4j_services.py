@@ -0,0 +1,95 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+import pytest
+
+from app.commons.neo4j_services import async_neo4j, bulk_get_by_geids, get_files_recursive
+from app.config import ConfigClass
+from tests.conftest import FILE_DATA, FOLDER_DATA
+
+
+def test_get_files_recursive_batches_levels(requests_mocker):
+    folder_a = {**FOLDER_DATA, "global_entity_id": "folder_a", "display_path": "admin/a"}
+    folder_b = {**FOLDER_DATA, "global_entity_id": "folder_b", "display_path": "admin/b"}
+    folder_c = {**FOLDER_DATA, "global_entity_id": "folder_c", "display_path": "admin/b/c"}
+    file_a = {**FILE_DATA, "global_entity_id": "file_a", "parent_folder_geid": "folder_a"}
+    file_c = {**FILE_DATA, "global_entity_id": "file_c", "parent_folder_geid": "folder_c"}
+    mocker = requests_mocker.post(ConfigClass.NEO4J_SERVICE_V2 + "relations/query", [
+        {"json": {"results": [folder_a, folder_b]}},
+        {"json": {"results": [file_a, folder_c]}},
+        {"json": {"results": [file_c]}},
+    ])
+
+    all_files = get_files_recursive("root_geid")
+
+    assert mocker.call_count == 3
+    assert mocker.request_history[1].json()["query"]["start_params"]["global_entity_id"] == ["folder_a", "folder_b"]
+    parents = {i["global_entity_id"]: i["parent_folder_geid"] for i in all_files}
+    assert parents == {
+        "folder_a": "root_geid",
+        "folder_b": "root_geid",
+        "file_a": "folder_a",
+        "folder_c": "folder_b",
+        "file_c": "folder_c",
+    }
+
+
+@pytest.mark.asyncio
+async def test_async_get_files_recursive_splits_level_over_concurrency(requests_mocker, monkeypatch):
+    monkeypatch.setattr(ConfigClass, "NEO4J_MAX_CONCURRENCY", 2)
+    folders = [
+        {**FOLDER_DATA, "global_entity_id": f"folder_{i}", "display_path": f"admin/folder_{i}"} for i in range(4)
+    ]
+    files = [
+        {**FILE_DATA, "global_entity_id": f"file_{i}", "parent_folder_geid": f"folder_{i}"} for i in range(4)
+    ]
+
+    def relations_callback(request, context):
+        start_geids = request.json()["query"]["start_params"]["global_entity_id"]
+        if start_geids == "root_geid":
+            return {"results": folders}
+        return {"results": [i for i in files if i["parent_folder_geid"] in start_geids]}
+
+    mocker = requests_mocker.post(ConfigClass.NEO4J_SERVICE_V2 + "relations/query", json=relations_callback)
+
+    all_files = await async_neo4j.get_files_recursive("root_geid")
+
+    # root level, then the four sibling folders expanded in two concurrent batches of two
+    assert mocker.call_count == 3
+    assert len(all_files) == 8
+    parents = {i["global_entity_id"]: i["parent_folder_geid"] for i in all_files}
+    assert parents["folder_3"] == "root_geid"
+    assert parents["file_3"] == "folder_3"
+
+
+def test_bulk_get_by_geids_streams_chunks_in_order(requests_mocker, monkeypatch):
+    monkeypatch.setattr(ConfigClass, "NEO4J_BULK_CHUNK_SIZE", 2)
+
+    def geids_callback(request, context):
+        return {"result": [{"global_entity_id": i} for i in request.json()["geids"]]}
+
+    mocker = requests_mocker.post(ConfigClass.NEO4J_SERVICE + "nodes/query/geids", json=geids_callback)
+
+    geids = [f"geid_{i}" for i in range(5)]
+    nodes = bulk_get_by_geids(geids)
+
+    assert mocker.call_count == 0
+    assert [i["global_entity_id"] for i in nodes] == geids
+    assert mocker.call_count == 3
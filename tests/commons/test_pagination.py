@@ -0,0 +1,92 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy import Column, Integer, create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, declarative_base
+
+from app.commons.psql_services.async_psql import get_async_db_uri, paginate_query
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "pagination_item"
+    id = Column(Integer, primary_key=True)
+
+
+@pytest.fixture
+def async_db_uri(db):
+    engine = create_engine(db.get_connection_url())
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([Item(id=i) for i in range(5)])
+        session.commit()
+    engine.dispose()
+    return get_async_db_uri(db.get_connection_url())
+
+
+@pytest.fixture
+def query():
+    # Only the statement of the query is executed, on the async session
+    return Session().query(Item).filter(Item.id > 0)
+
+
+@asynccontextmanager
+async def get_session(uri: str):
+    # An engine of the test's own loop
+    engine = create_async_engine(uri)
+    try:
+        async with AsyncSession(engine) as session:
+            yield session
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_exact_total_counts_every_row(async_db_uri, query):
+    async with get_session(async_db_uri) as session:
+        results, next_cursor, total = await paginate_query(session, query, [(Item.id, False)], 0, 2)
+        assert [i.id for i in results] == [1, 2]
+        assert total == 4
+
+        results, next_cursor, total = await paginate_query(session, query, [(Item.id, False)], 0, 2, next_cursor)
+        assert [i.id for i in results] == [3, 4]
+        assert next_cursor is None
+        assert total == 4
+
+
+@pytest.mark.asyncio
+async def test_cursor_carries_the_total(async_db_uri, query):
+    async with get_session(async_db_uri) as session:
+        results, next_cursor, total = await paginate_query(session, query, [(Item.id, False)], 0, 2)
+        assert total == 4
+
+        # Cursor pages don't count again, the total is the one of the first page
+        session.add(Item(id=5))
+        await session.commit()
+        results, next_cursor, total = await paginate_query(session, query, [(Item.id, False)], 0, 2, next_cursor)
+        assert [i.id for i in results] == [3, 4]
+        assert next_cursor is not None
+        assert total == 4
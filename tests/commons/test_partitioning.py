@@ -0,0 +1,57 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+import pytest
+from fastapi_sqlalchemy import db
+from sqlalchemy import text
+
+from app.commons.psql_services import bulk_create_entities, get_request_files_query
+from app.commons.psql_services.query_plan import get_plan_nodes, get_query_plan
+from app.models.copy_request_sql import ENTITY_PARTITIONS, EntityModel, RequestModel
+from tests.conftest import FILE_DATA
+
+# The partitioned layout only runs with RDS_ENTITY_PARTITIONS set, conftest then starts postgres 11
+pytestmark = pytest.mark.skipif(not ENTITY_PARTITIONS, reason="RDS_ENTITY_PARTITIONS is not set")
+
+
+def test_entity_partitions(test_client):
+    with db():
+        partitions = db.session.execute(text(
+            "SELECT count(*) FROM pg_inherits WHERE inhparent = CAST(:table AS regclass)"
+        ), {"table": EntityModel.__table__.fullname}).scalar()
+    assert partitions == ENTITY_PARTITIONS
+
+
+def test_request_queries_read_one_partition(test_client):
+    with db(commit_on_exit=True):
+        request_obj = RequestModel(status="pending", project_geid="partition_project", submitted_by="admin")
+        db.session.add(request_obj)
+        db.session.flush()
+        files = [{**FILE_DATA, "global_entity_id": f"partition_file_{i}", "parent_folder_geid": None} for i in range(5)]
+        bulk_create_entities(db.session, request_obj.id, files)
+        request_id = request_obj.id
+
+    with db():
+        # The request_id equality prunes every other partition at plan time
+        nodes = get_plan_nodes(get_query_plan(get_request_files_query(request_id)))
+        tables = {i["Relation Name"] for i in nodes if "Relation Name" in i}
+        assert len(tables) == 1
+        assert tables.pop().startswith(EntityModel.__tablename__ + "_p")
+        assert get_request_files_query(request_id).count() == 5
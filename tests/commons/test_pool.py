@@ -0,0 +1,71 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+import threading
+
+import pytest
+from sqlalchemy import create_engine, event, exc
+
+from app.commons.psql_services.pool import (MeteredQueuePool, pool_stats, set_local_statement_timeout,
+                                            setup_statement_timeout)
+from app.config import ConfigClass
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    # Pools of the test register in their own registry, the app's pools are left as they are
+    monkeypatch.setattr("app.commons.psql_services.pool.pools", {})
+    engine = create_engine(
+        "sqlite://",
+        poolclass=MeteredQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.5,
+        connect_args={"check_same_thread": False},
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_pool_counts_checkouts_waits_and_timeouts(engine):
+    connection = engine.connect()
+    # The only connection is returned by another thread while the next checkout waits
+    threading.Timer(0.1, connection.close).start()
+    engine.connect().close()
+    with engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+
+    metrics = pool_stats()["sync"]
+    assert metrics["checkouts"] == 3
+    assert metrics["waits"] == 1
+    assert metrics["wait_seconds"] > 0
+    assert metrics["timeouts"] == 1
+    assert metrics["checked_out"] == 0
+
+
+def test_statement_timeout_only_on_the_given_engine(engine, monkeypatch):
+    monkeypatch.setattr(ConfigClass, "RDS_PGBOUNCER", True)
+    monkeypatch.setattr(ConfigClass, "RDS_STATEMENT_TIMEOUT", 1000)
+    other_engine = create_engine("sqlite://")
+    setup_statement_timeout(engine)
+    assert event.contains(engine, "begin", set_local_statement_timeout)
+    assert not event.contains(other_engine, "begin", set_local_statement_timeout)
+    event.remove(engine, "begin", set_local_statement_timeout)
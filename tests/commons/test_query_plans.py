@@ -0,0 +1,162 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+import pytest
+from fastapi_sqlalchemy import db
+from sqlalchemy import text
+
+from app.commons.psql_services import (bulk_create_entities, get_ancestors_query, get_geids_filter,
+                                       get_pending_query, get_request_files_query, get_requests_query,
+                                       get_sub_files_query, get_sub_folder_files_query)
+from app.commons.psql_services.pagination import get_order_by, get_page_query
+from app.commons.psql_services.query_plan import get_plan_nodes, get_query_plan
+from app.models.copy_request_sql import EntityModel, RequestModel
+from tests.conftest import FILE_DATA, FOLDER_DATA
+
+PROJECT_GEID = "query_plan_project"
+
+
+@pytest.fixture
+def seeded_request_id(test_client):
+    with db(commit_on_exit=True):
+        request_obj = RequestModel(status="pending", project_geid=PROJECT_GEID, submitted_by="admin")
+        db.session.add(request_obj)
+        db.session.flush()
+        folder = {**FOLDER_DATA, "global_entity_id": "plan_folder", "parent_folder_geid": None}
+        files = [
+            {**FILE_DATA, "global_entity_id": f"plan_file_{i}", "parent_folder_geid": "plan_folder"} for i in range(50)
+        ]
+        bulk_create_entities(db.session, request_obj.id, [folder] + files)
+
+        # Requests of other users with reviewed files so the statistics look like a shared table
+        for i in range(20):
+            other_obj = RequestModel(status="pending", project_geid=PROJECT_GEID, submitted_by=f"plan_user_{i}")
+            db.session.add(other_obj)
+            db.session.flush()
+            folder = {**FOLDER_DATA, "global_entity_id": f"plan_folder_{i}", "parent_folder_geid": None}
+            files = [
+                {**FILE_DATA, "global_entity_id": f"plan_file_{i}_{j}", "parent_folder_geid": f"plan_folder_{i}"}
+                for j in range(100)
+            ]
+            bulk_create_entities(db.session, other_obj.id, [folder] + files)
+            db.session.query(EntityModel).filter_by(request_id=other_obj.id, entity_type="file").filter(
+                EntityModel.entity_geid.like(f"plan_file_{i}_1_")
+            ).update({"review_status": "approved"}, synchronize_session=False)
+        db.session.execute(text(f"ANALYZE {EntityModel.__table__.fullname}"))
+        db.session.execute(text(f"ANALYZE {RequestModel.__table__.fullname}"))
+        return request_obj.id
+
+
+def get_index_names() -> dict:
+    # Index of a partition to the index of the partitioned table it belongs to, with RDS_ENTITY_PARTITIONS
+    # the plans name the partition indexes
+    parents = db.session.execute(text(
+        "SELECT child.relname, parent.relname FROM pg_inherits "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "WHERE child.relkind = 'i'"
+    ))
+    return dict(list(parents))
+
+
+def get_used_indexes(nodes: list, index_names: dict) -> dict:
+    return {index_names.get(i["Index Name"], i["Index Name"]): i for i in nodes if "Index Name" in i}
+
+
+def endpoint_queries(request_id):
+    # Each query with the indexes that may serve it, any one of them has to show up in its plan
+    return {
+        "list_requests": (get_requests_query(PROJECT_GEID, "pending").order_by(
+            RequestModel.submitted_at.desc()
+        ).limit(25), {"approval_request_project_status_idx", "approval_request_project_status_user_idx"}),
+        "list_requests_submitted_by": (get_requests_query(PROJECT_GEID, "pending", "admin").order_by(
+            RequestModel.submitted_at.desc()
+        ).limit(25), {"approval_request_project_status_user_idx"}),
+        "list_request_files": (get_request_files_query(request_id).order_by(
+            EntityModel.entity_type.desc(), EntityModel.uploaded_at.asc()
+        ).limit(25), {"approval_entity_listing_idx"}),
+        "list_request_files_folder": (get_request_files_query(
+            request_id, "plan_folder", {"name": "test"}, ["name"]
+        ).order_by(EntityModel.entity_type.desc(), EntityModel.name.desc()).limit(25), {
+            "approval_entity_listing_idx", "approval_entity_name_trgm_idx"
+        }),
+        "list_request_files_search": (get_request_files_query(
+            request_id, None, {"name": "file_1", "uploaded_by": "ADM"}, ["name", "uploaded_by"], "icontains"
+        ).limit(25), {
+            "approval_entity_name_trgm_idx",
+            "approval_entity_uploaded_by_trgm_idx",
+            "approval_entity_listing_idx",
+        }),
+        "routing": (get_ancestors_query(request_id, "plan_folder"), {"approval_entity_request_geid_idx"}),
+        "pending": (get_pending_query(request_id), {
+            "approval_entity_pending_idx", "approval_entity_request_status_idx"
+        }),
+        "review_status_count": (
+            db.session.query(EntityModel).filter_by(request_id=request_id, review_status="approved"),
+            {"approval_entity_request_status_idx"},
+        ),
+        "top_level_entities": (
+            db.session.query(EntityModel).filter_by(request_id=request_id, parent_geid=None),
+            {"approval_entity_listing_idx"},
+        ),
+        "sub_files": (get_sub_files_query(db.session, request_id, ["plan_folder", "plan_file_1"]), {
+            "approval_entity_request_geid_idx", "approval_entity_path_idx", "approval_entity_request_status_idx"
+        }),
+        "sub_folder_files": (get_sub_folder_files_query(db.session, request_id, ["plan_folder"], "approved"), {
+            "approval_entity_path_idx", "approval_entity_request_status_idx"
+        }),
+        "update_files": (db.session.query(EntityModel).filter_by(request_id=request_id).filter(
+            get_geids_filter(["plan_file_1", "plan_file_2"])
+        ), {"approval_entity_request_geid_idx"}),
+    }
+
+
+def test_endpoint_queries_use_indexes(seeded_request_id):
+    with db():
+        # Sequential scans are disabled so the planner doesn't prefer them on a small table, the index names
+        # in the plans tell that the indexes meant for each query serve it
+        db.session.execute(text("SET LOCAL enable_seqscan = off"))
+        seq_scans = {}
+        missing_indexes = {}
+        index_names = get_index_names()
+        for name, (query, indexes) in endpoint_queries(seeded_request_id).items():
+            nodes = get_plan_nodes(get_query_plan(query))
+            tables = [i["Relation Name"] for i in nodes if i["Node Type"] == "Seq Scan"]
+            if tables:
+                seq_scans[name] = tables
+            used_indexes = set(get_used_indexes(nodes, index_names))
+            if not used_indexes & indexes:
+                missing_indexes[name] = used_indexes
+        assert seq_scans == {}
+        assert missing_indexes == {}
+
+
+def test_cursor_page_is_an_index_range(seeded_request_id):
+    with db():
+        # A descending listing sorts every column the same way, the cursor is a row comparison that bounds
+        # the listing index scan so the page reads only its own rows
+        query = get_request_files_query(seeded_request_id, "plan_folder")
+        columns = [(EntityModel.entity_type, True), (EntityModel.uploaded_at, True), (EntityModel.id, True)]
+        last = query.order_by(*get_order_by(columns)).offset(10).first()
+        after = [getattr(last, column.key) for column, _ in columns]
+        nodes = get_plan_nodes(get_query_plan(get_page_query(query, columns, 0, 25, after)))
+        assert not [i for i in nodes if "Sort" in i["Node Type"]]
+        scan = get_used_indexes(nodes, get_index_names())["approval_entity_listing_idx"]
+        assert "ROW(" in scan["Index Cond"]
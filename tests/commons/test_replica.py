@@ -0,0 +1,50 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+import time
+
+import pytest
+from starlette.requests import Request
+
+from app.commons.psql_services.replica import PRIMARY_COOKIE, use_primary
+from app.config import ConfigClass
+
+
+def make_request(query_string: bytes = b"", primary_until: float = None) -> Request:
+    headers = []
+    if primary_until is not None:
+        headers.append((b"cookie", f"{PRIMARY_COOKIE}={primary_until}".encode()))
+    return Request({"type": "http", "query_string": query_string, "headers": headers})
+
+
+def test_reads_use_primary_without_replica(monkeypatch):
+    monkeypatch.setattr(ConfigClass, "RDS_REPLICA_DB_URI", "")
+    assert use_primary(make_request())
+
+
+@pytest.mark.parametrize("query_string, primary_until, expected", [
+    (b"", None, False),
+    (b"consistent=true", None, True),
+    (b"", time.time() + 60, True),
+    (b"", time.time() - 60, False),
+])
+def test_reads_routed_to_replica(monkeypatch, query_string, primary_until, expected):
+    monkeypatch.setattr(ConfigClass, "RDS_REPLICA_DB_URI", "postgresql://replica/approval")
+    assert use_primary(make_request(query_string, primary_until)) == expected
@@ -0,0 +1,73 @@
+# Copyright 2022 Indoc Research
+# 
+# Licensed under the EUPL, Version 1.2 or – as soon they
+# will be approved by the European Commission - subsequent
+# versions of the EUPL (the "Licence");
+# You may not use this work except in compliance with the
+# Licence.
+# You may obtain a copy of the Licence at:
+# 
+# https://joinup.ec.europa.eu/collection/eupl/eupl-text-eupl-12
+# 
+# Unless required by applicable law or agreed to in
+# writing, software distributed under the Licence is
+# distributed on an "AS IS" basis,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either
+# express or implied.
+# See the Licence for the specific language governing
+# permissions and limitations under the Licence.
+# 
+
+import pytest
+from fastapi_sqlalchemy import db
+
+from app.commons.psql_services import bulk_create_entities, get_all_sub_files, get_all_sub_folder_nodes
+from app.models.copy_request_sql import EntityModel, RequestModel
+from tests.conftest import FILE_DATA, FOLDER_DATA
+
+
+def create_request(prefix: str) -> str:
+    # <prefix>_folder/<prefix>_file, <prefix>_folder/<prefix>_sub/<prefix>_sub_pending and <prefix>_sub_approved,
+    # and the top level <prefix>_top approved
+    entities = [
+        {**FOLDER_DATA, "global_entity_id": f"{prefix}_folder", "parent_folder_geid": None},
+        {**FILE_DATA, "global_entity_id": f"{prefix}_top", "parent_folder_geid": None},
+        {**FILE_DATA, "global_entity_id": f"{prefix}_file", "parent_folder_geid": f"{prefix}_folder"},
+        {**FOLDER_DATA, "global_entity_id": f"{prefix}_sub", "parent_folder_geid": f"{prefix}_folder"},
+        {**FILE_DATA, "global_entity_id": f"{prefix}_sub_pending", "parent_folder_geid": f"{prefix}_sub"},
+        {**FILE_DATA, "global_entity_id": f"{prefix}_sub_approved", "parent_folder_geid": f"{prefix}_sub"},
+    ]
+    with db(commit_on_exit=True):
+        request_obj = RequestModel(status="pending", project_geid="subtree_project", submitted_by="admin")
+        db.session.add(request_obj)
+        db.session.flush()
+        bulk_create_entities(db.session, request_obj.id, entities)
+        db.session.query(EntityModel).filter(
+            EntityModel.request_id == request_obj.id,
+            EntityModel.entity_geid.in_([f"{prefix}_top", f"{prefix}_sub_approved"]),
+        ).update({"review_status": "approved"}, synchronize_session=False)
+        return request_obj.id
+
+
+@pytest.fixture
+def request_id(test_client):
+    # A second request with the same tree must not show up in the first one's subtrees
+    create_request("subtree_other")
+    return create_request("subtree")
+
+
+def test_sub_files(request_id):
+    with db():
+        # Files given directly in any state, pending files at any depth under the given folders
+        sub_files = get_all_sub_files(db.session, request_id, ["subtree_folder", "subtree_top"])
+    assert sorted(sub_files) == ["subtree_file", "subtree_sub_pending", "subtree_top"]
+
+
+def test_sub_folder_nodes(request_id):
+    with db():
+        approved = get_all_sub_folder_nodes(db.session, request_id, ["subtree_folder"], "approved")
+        pending = get_all_sub_folder_nodes(db.session, request_id, ["subtree_sub"], "pending")
+        assert approved == ["subtree_sub_approved"]
+        assert sorted(pending) == ["subtree_sub_pending"]
+        # A file has no subtree
+        assert get_all_sub_folder_nodes(db.session, request_id, ["subtree_top"], "approved") == []
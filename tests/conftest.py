@@ -29,7 +29,7 @@ from testcontainers.postgres import PostgresContainer
 
 from app.config import ConfigClass
 from app.main import create_app
-from app.models.copy_request_sql import Base, EntityModel, RequestModel
+from app.models.copy_request_sql import ENTITY_PARTITIONS, Base, EntityModel, RequestModel
 
 FILE_DATA = {
     "global_entity_id": "approval_test_geid1",
@@ -100,7 +100,9 @@ def mock_src_dest_folder(requests_mocker):
 
 @pytest.fixture(scope='session', autouse=True)
 def db():
-    with PostgresContainer("postgres:9.5") as postgres:
+    # RDS_ENTITY_PARTITIONS runs the suite on the partitioned layout, hash partitioning needs postgres 11
+    image = "postgres:11" if ENTITY_PARTITIONS else "postgres:9.5"
+    with PostgresContainer(image) as postgres:
         postgres_uri  = postgres.get_connection_url()
         if not database_exists(postgres_uri):
             create_database(postgres_uri)
@@ -109,6 +111,8 @@ def db():
         CreateTable(EntityModel.__table__).compile(dialect=postgresql.dialect())
         if not engine.dialect.has_schema(engine, ConfigClass.RDS_SCHEMA_DEFAULT):
             engine.execute(CreateSchema(ConfigClass.RDS_SCHEMA_DEFAULT))
+        # The trigram indexes need pg_trgm, created by migration 009 outside the tests
+        engine.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
         Base.metadata.create_all(bind=engine)
         yield postgres
 
@@ -18,8 +18,13 @@
 # permissions and limitations under the Licence.
 # 
 
+import csv
+import io
+import json
+
 import pytest
 
+from app.commons.cache_services import routing_cache
 from app.config import ConfigClass
 from tests.conftest import FILE_DATA, FOLDER_DATA, USER_DATA
 
@@ -69,6 +74,12 @@ def test_list_requests_200(test_client, requests_mocker):
     assert response.json()["result"][0]["destination_geid"] == "dest_folder_geid"
     assert response.json()["result"][0]["note"] == "testing"
 
+    for total_mode in ["none", "estimate"]:
+        payload["total_mode"] = total_mode
+        response = test_client.get("/v1/request/copy/approval_fake_project", params=payload)
+        assert response.status_code == 200
+        assert response.json()["result"][0]["destination_geid"] == "dest_folder_geid"
+
 
 @pytest.mark.dependency(depends=["test_create_request_200"])
 def test_list_request_files_200(test_client, requests_mocker):
@@ -88,7 +99,54 @@ def test_list_request_files_200(test_client, requests_mocker):
     assert len(response.json()["result"]["data"]) == 2
     assert len(response.json()["result"]["routing"]) == 0
     assert response.json()["result"]["data"][0]["name"] == "test_folder"
+    assert response.json()["result"]["data"][0]["file_count"] == 1
+    assert response.json()["result"]["data"][0]["total_size"] == 123
+    assert response.json()["result"]["data"][0]["pending_count"] == 1
     assert response.json()["result"]["data"][1]["name"] == "test_file"
+    assert response.json()["result"]["data"][1]["file_count"] is None
+
+
+@pytest.mark.dependency(depends=["test_create_request_200"])
+def test_list_request_files_cursor_200(test_client, requests_mocker):
+    payload = {
+        "status": "pending"
+    }
+    response = test_client.get("/v1/request/copy/approval_fake_project", params=payload)
+    request_obj = response.json()["result"][0]
+
+    payload = {
+        "request_id": request_obj["id"],
+        "order_by": "name",
+        "order_type": "desc",
+        "page_size": 1,
+    }
+    response = test_client.get("/v1/request/copy/approval_fake_project/files", params=payload)
+    assert response.status_code == 200
+    assert response.json()["result"]["data"][0]["name"] == "test_folder"
+    assert response.json()["next_cursor"]
+
+    payload["cursor"] = response.json()["next_cursor"]
+    response = test_client.get("/v1/request/copy/approval_fake_project/files", params=payload)
+    assert response.status_code == 200
+    assert len(response.json()["result"]["data"]) == 1
+    assert response.json()["result"]["data"][0]["name"] == "test_file"
+    assert response.json()["next_cursor"] is None
+    assert response.json()["total"] == 2
+
+    payload["total_mode"] = "none"
+    response = test_client.get("/v1/request/copy/approval_fake_project/files", params=payload)
+    assert response.status_code == 200
+    assert response.json()["total"] is None
+    assert response.json()["num_of_pages"] is None
+    assert response.json()["result"]["data"][0]["name"] == "test_file"
+
+    payload["total_mode"] = "estimate"
+    payload.pop("cursor")
+    response = test_client.get("/v1/request/copy/approval_fake_project/files", params=payload)
+    assert response.status_code == 200
+    assert response.json()["result"]["data"][0]["name"] == "test_folder"
+    assert response.json()["next_cursor"]
+    assert response.json()["total"] is not None
 
 
 @pytest.mark.dependency(depends=["test_create_request_200"])
@@ -110,8 +168,52 @@ def test_list_request_files_query_200(test_client, requests_mocker):
     assert response.status_code == 200
     assert len(response.json()["result"]["data"]) == 1
     assert len(response.json()["result"]["routing"]) == 1
+    assert response.json()["result"]["routing"][0]["entity_geid"] == "approval_test_geid2"
+    assert response.json()["result"]["data"][0]["name"] == "test_file"
+    assert response.json()["result"]["data"][0]["path"] == "/approval_test_geid2/approval_test_geid1/"
+
+    payload["query"] = '{"name": "TEST_F"}'
+    payload["partial"] = '["name"]'
+    payload["partial_match"] = "iprefix"
+    response = test_client.get("/v1/request/copy/approval_fake_project/files", params=payload)
+    assert response.status_code == 200
     assert response.json()["result"]["data"][0]["name"] == "test_file"
 
+    # Routing of the same folder is served from the cache
+    hits = routing_cache.stats()["hits"]
+    response = test_client.get("/v1/request/copy/approval_fake_project/files", params=payload)
+    assert response.json()["result"]["routing"][0]["entity_geid"] == "approval_test_geid2"
+    assert routing_cache.stats()["hits"] == hits + 1
+
+
+@pytest.mark.dependency(depends=["test_create_request_200"])
+def test_export_request_files_200(test_client, requests_mocker):
+    payload = {
+        "status": "pending",
+    }
+    response = test_client.get("/v1/request/copy/approval_fake_project", params=payload)
+    request_obj = response.json()["result"][0]
+
+    payload = {
+        "request_id": request_obj["id"],
+        "parent_geid": "approval_test_geid2",
+    }
+    response = test_client.get("/v1/request/copy/approval_fake_project/files/export", params=payload)
+    assert response.status_code == 200
+    entities = [json.loads(i) for i in response.text.splitlines()]
+    assert [i["entity_geid"] for i in entities] == ["approval_test_geid1"]
+    assert entities[0]["request_id"] == request_obj["id"]
+
+    payload["export_format"] = "csv"
+    response = test_client.get("/v1/request/copy/approval_fake_project/files/export", params=payload)
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [i["entity_geid"] for i in rows] == ["approval_test_geid1"]
+
+    payload["parent_geid"] = "missing_folder_geid"
+    response = test_client.get("/v1/request/copy/approval_fake_project/files/export", params=payload)
+    assert response.status_code == 404
+
 
 @pytest.mark.dependency(depends=["test_create_request_200"])
 def test_approve_partial_files_200(test_client, requests_mocker):
@@ -143,6 +245,17 @@ def test_approve_partial_files_200(test_client, requests_mocker):
     assert response.json()["result"]["approved"] == 0
     assert response.json()["result"]["denied"] == 0
 
+    # The folder rollups follow the review
+    payload = {
+        "request_id": request_obj["id"],
+        "query": '{"entity_type": "folder"}',
+    }
+    response = test_client.get("/v1/request/copy/approval_fake_project/files", params=payload)
+    folder = response.json()["result"]["data"][0]
+    assert folder["pending_count"] == 0
+    assert folder["approved_count"] == 1
+    assert folder["file_count"] == 1
+
 
 @pytest.mark.dependency(depends=["test_create_request_200"])
 def test_approve_all_files_200(test_client, requests_mocker):
@@ -408,3 +521,273 @@ def test_pending_files_list_200(test_client, requests_mocker):
     assert response.status_code == 200
     assert response.json()["result"]["pending_entities"] == ['approval_test_geid3']
     assert response.json()["result"]["pending_count"] == 1
+
+
+def test_pending_files_verify_archived_200(test_client, requests_mocker, mock_src_dest_folder, mock_user, mock_project):
+    file_data = FILE_DATA.copy()
+    file_data["global_entity_id"] = "approval_test_geid5"
+
+    mock_data = {"result": [file_data]}
+    requests_mocker.post(ConfigClass.NEO4J_SERVICE + "nodes/query/geids", json=mock_data)
+    requests_mocker.post(ConfigClass.EMAIL_SERVICE, json={})
+
+    payload = {
+        "entity_geids": [file_data["global_entity_id"]],
+        "destination_geid": "dest_folder_geid",
+        "source_geid": "src_folder_geid",
+        "note": "testing",
+        "submitted_by": "admin",
+    }
+    response = test_client.post("/v1/request/copy/approval_fake_project", json=payload)
+    assert response.status_code == 200
+    request_obj = response.json()["result"]
+
+    # archived state is served from psql until a verify is asked for
+    archived_data = {"result": [{**file_data, "archived": True}]}
+    requests_mocker.post(ConfigClass.NEO4J_SERVICE + "nodes/query/geids", json=archived_data)
+    payload = {
+        "request_id": request_obj["id"],
+    }
+    response = test_client.get("/v1/request/copy/approval_fake_project/pending-files", params=payload)
+    assert response.status_code == 200
+    assert response.json()["result"]["pending_count"] == 1
+
+    payload["verify"] = True
+    response = test_client.get("/v1/request/copy/approval_fake_project/pending-files", params=payload)
+    assert response.status_code == 200
+    assert response.json()["result"]["pending_entities"] == []
+    assert response.json()["result"]["pending_count"] == 0
+
+    # a file restored in neo4j is pending again after the next verify
+    requests_mocker.post(ConfigClass.NEO4J_SERVICE + "nodes/query/geids", json=mock_data)
+    response = test_client.get("/v1/request/copy/approval_fake_project/pending-files", params=payload)
+    assert response.status_code == 200
+    assert response.json()["result"]["pending_entities"] == [file_data["global_entity_id"]]
+    assert response.json()["result"]["pending_count"] == 1
+
+    requests_mocker.post(ConfigClass.NEO4J_SERVICE + "nodes/query/geids", json=archived_data)
+    response = test_client.get("/v1/request/copy/approval_fake_project/pending-files", params=payload)
+    assert response.status_code == 200
+    assert response.json()["result"]["pending_count"] == 0
+
+    payload = {
+        "request_id": request_obj["id"],
+        "status": "complete",
+        "review_notes": "done",
+        "username": "admin",
+    }
+    response = test_client.put("/v1/request/copy/approval_fake_project", json=payload)
+    assert response.status_code == 200
+    assert response.json()["result"]["pending_count"] == 0
+
+
+@pytest.mark.parametrize("purge_threshold", [10000, 0])
+def test_delete_request_200(test_client, requests_mocker, mock_src_dest_folder, mock_user, mock_project,
+                            monkeypatch, purge_threshold):
+    # A threshold of 0 sends every request through the background purge
+    monkeypatch.setattr(ConfigClass, "ENTITY_PURGE_THRESHOLD", purge_threshold)
+    file_data = FILE_DATA.copy()
+    file_data["global_entity_id"] = f"approval_delete_geid_{purge_threshold}"
+
+    mock_data = {"result": [file_data]}
+    requests_mocker.post(ConfigClass.NEO4J_SERVICE + "nodes/query/geids", json=mock_data)
+    requests_mocker.post(ConfigClass.EMAIL_SERVICE, json={})
+
+    payload = {
+        "entity_geids": [file_data["global_entity_id"]],
+        "destination_geid": "dest_folder_geid",
+        "source_geid": "src_folder_geid",
+        "note": "testing",
+        "submitted_by": "admin",
+    }
+    response = test_client.post("/v1/request/copy/approval_fake_project", json=payload)
+    assert response.status_code == 200
+    request_id = response.json()["result"]["id"]
+
+    response = test_client.delete(f"/v1/request/copy/approval_fake_project/delete/{request_id}")
+    assert response.status_code == 200
+    assert response.json()["result"] == "success"
+
+    payload = {
+        "request_id": request_id,
+    }
+    response = test_client.get("/v1/request/copy/approval_fake_project/files", params=payload)
+    assert response.status_code == 200
+    assert response.json()["result"]["data"] == []
+    assert response.json()["total"] == 0
+
+
+def test_create_request_async_202(test_client, requests_mocker, mock_project, mock_src_dest_folder, mock_user):
+    file_data = FILE_DATA.copy()
+    file_data["global_entity_id"] = "approval_test_geid5"
+
+    mock_data = {"result": [file_data]}
+    requests_mocker.post(ConfigClass.NEO4J_SERVICE + "nodes/query/geids", json=mock_data)
+
+    # mock notification
+    requests_mocker.post(ConfigClass.EMAIL_SERVICE, json={})
+
+    # mock get project admins
+    mock_data = [{
+        "start_node": USER_DATA,
+        "end_node": {},
+    }]
+    requests_mocker.post(ConfigClass.NEO4J_SERVICE + "relations/query", json=mock_data)
+
+    payload = {
+        "entity_geids": [file_data["global_entity_id"]],
+        "destination_geid": "dest_folder_geid",
+        "source_geid": "src_folder_geid",
+        "note": "testing",
+        "submitted_by": "admin",
+        "asynchronous": True,
+    }
+    response = test_client.post("/v1/request/copy/approval_async_project", json=payload)
+    assert response.status_code == 202
+    assert response.json()["result"]["status"] == "ingesting"
+    request_id = response.json()["result"]["id"]
+
+    # The test client runs the background ingestion before returning
+    response = test_client.get("/v1/request/copy/approval_async_project/status", params={"request_id": request_id})
+    assert response.status_code == 200
+    assert response.json()["result"]["status"] == "pending"
+    assert response.json()["result"]["discovered_count"] == 1
+    assert response.json()["result"]["inserted_count"] == 1
+
+    response = test_client.get(
+        "/v1/request/copy/approval_async_project/status",
+        params={"request_id": "00000000-0000-0000-0000-000000000000"},
+    )
+    assert response.status_code == 404
+
+
+def test_create_request_async_failed(test_client, requests_mocker, mock_project, mock_user):
+    file_data = FILE_DATA.copy()
+    file_data["global_entity_id"] = "approval_test_geid6"
+
+    mock_data = {"result": [file_data]}
+    requests_mocker.post(ConfigClass.NEO4J_SERVICE + "nodes/query/geids", json=mock_data)
+    # The ingestion fails on the source and destination folders
+    requests_mocker.get(ConfigClass.NEO4J_SERVICE + "nodes/geid/failed_src_geid", status_code=500, json={})
+    requests_mocker.get(ConfigClass.NEO4J_SERVICE + "nodes/geid/failed_dest_geid", status_code=500, json={})
+
+    payload = {
+        "entity_geids": [file_data["global_entity_id"]],
+        "destination_geid": "failed_dest_geid",
+        "source_geid": "failed_src_geid",
+        "note": "testing",
+        "submitted_by": "admin",
+        "asynchronous": True,
+    }
+    response = test_client.post("/v1/request/copy/approval_async_project", json=payload)
+    assert response.status_code == 202
+    request_id = response.json()["result"]["id"]
+
+    response = test_client.get("/v1/request/copy/approval_async_project/status", params={"request_id": request_id})
+    assert response.status_code == 200
+    assert response.json()["result"]["status"] == "failed"
+    assert response.json()["result"]["inserted_count"] == 0
+
+    # Failed requests can't be reviewed or completed, only deleted
+    payload = {
+        "entity_geids": [file_data["global_entity_id"]],
+        "request_id": request_id,
+        "review_status": "approved",
+        "username": "admin",
+        "session_id": "admin-123"
+    }
+    response = test_client.patch("/v1/request/copy/approval_async_project/files", json=payload)
+    assert response.status_code == 409
+
+    response = test_client.delete(f"/v1/request/copy/approval_async_project/delete/{request_id}")
+    assert response.status_code == 200
+
+
+def test_deleted_request_409(test_client, requests_mocker, mock_src_dest_folder, mock_user, mock_project,
+                             monkeypatch):
+    # Without the purge the request stays soft deleted
+    monkeypatch.setattr(ConfigClass, "ENTITY_PURGE_THRESHOLD", 0)
+    monkeypatch.setattr("app.commons.psql_services.async_psql.purge_request", lambda request_id: None)
+    file_data = FILE_DATA.copy()
+    file_data["global_entity_id"] = "approval_deleted_geid"
+
+    mock_data = {"result": [file_data]}
+    requests_mocker.post(ConfigClass.NEO4J_SERVICE + "nodes/query/geids", json=mock_data)
+    requests_mocker.post(ConfigClass.EMAIL_SERVICE, json={})
+
+    payload = {
+        "entity_geids": [file_data["global_entity_id"]],
+        "destination_geid": "dest_folder_geid",
+        "source_geid": "src_folder_geid",
+        "note": "testing",
+        "submitted_by": "admin",
+    }
+    response = test_client.post("/v1/request/copy/approval_fake_project", json=payload)
+    assert response.status_code == 200
+    request_id = response.json()["result"]["id"]
+
+    response = test_client.delete(f"/v1/request/copy/approval_fake_project/delete/{request_id}")
+    assert response.status_code == 200
+
+    payload = {
+        "request_id": request_id,
+        "review_status": "approved",
+        "username": "admin",
+        "session_id": "admin-123"
+    }
+    response = test_client.put("/v1/request/copy/approval_fake_project/files", json=payload)
+    assert response.status_code == 409
+
+    payload["entity_geids"] = [file_data["global_entity_id"]]
+    response = test_client.patch("/v1/request/copy/approval_fake_project/files", json=payload)
+    assert response.status_code == 409
+
+    payload = {
+        "request_id": request_id,
+        "status": "complete",
+        "review_notes": "done",
+        "username": "admin",
+    }
+    response = test_client.put("/v1/request/copy/approval_fake_project", json=payload)
+    assert response.status_code == 409
+
+
+def test_archived_files_leave_folder_rollups(test_client, requests_mocker, mock_project, mock_src_dest_folder,
+                                             mock_user):
+    folder_data = {**FOLDER_DATA, "global_entity_id": "approval_rollup_folder"}
+    file_data = {
+        **FILE_DATA,
+        "global_entity_id": "approval_rollup_file",
+        "parent_folder_geid": "approval_rollup_folder",
+    }
+    requests_mocker.post(ConfigClass.EMAIL_SERVICE, json={})
+    requests_mocker.post(ConfigClass.NEO4J_SERVICE + "nodes/query/geids", json={"result": [folder_data]})
+    requests_mocker.post(ConfigClass.NEO4J_SERVICE_V2 + "relations/query", json={"results": [file_data]})
+
+    payload = {
+        "entity_geids": [folder_data["global_entity_id"]],
+        "destination_geid": "dest_folder_geid",
+        "source_geid": "src_folder_geid",
+        "note": "testing",
+        "submitted_by": "admin",
+    }
+    response = test_client.post("/v1/request/copy/approval_fake_project", json=payload)
+    assert response.status_code == 200
+    request_id = response.json()["result"]["id"]
+
+    def get_folder():
+        response = test_client.get("/v1/request/copy/approval_fake_project/files", params={"request_id": request_id})
+        return response.json()["result"]["data"][0]
+
+    assert get_folder()["pending_count"] == 1
+
+    # archived files leave the pending rollups of their folders with the summary, and come back when restored
+    for archived, pending_count in [(True, 0), (False, 1)]:
+        mock_data = {"result": [{**file_data, "archived": archived}]}
+        requests_mocker.post(ConfigClass.NEO4J_SERVICE + "nodes/query/geids", json=mock_data)
+        payload = {"request_id": request_id, "verify": True}
+        response = test_client.get("/v1/request/copy/approval_fake_project/pending-files", params=payload)
+        assert response.json()["result"]["pending_count"] == pending_count
+        folder = get_folder()
+        assert folder["pending_count"] == pending_count
+        assert folder["file_count"] == 1